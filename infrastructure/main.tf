@@ -73,6 +73,7 @@ resource "null_resource" "zip_lambda_layer" {
       rm -rf /tmp/python
       mkdir /tmp/python
       cp -r ${path.module}/../src/etl/ /tmp/python/etl
+      pip install aiohttp --target /tmp/python --platform manylinux2014_aarch64 --python-version 3.10 --only-binary=:all:
       cd /tmp/
       zip -r ${path.module}/etl_layer.zip ./python/
     EOT
@@ -226,8 +227,8 @@ module "raw_product_categories" {
   source = "./lambdas"
   lambda_fn_name = "raw_download_product_category"
   lambda_fn_script_name = "lambda_raw_download_product_category"
-  memory_size = 512
-  timeout = 60*5
+  memory_size = 1024
+  timeout = 60*15
   tfm_role = module.iam.TFMRole_arn
   etl_lambda_layer_arn = aws_lambda_layer_version.etl_layer.arn
 }
@@ -237,8 +238,8 @@ module "bronze_categories" {
   source = "./lambdas"
   lambda_fn_name = "bronze_categories"
   lambda_fn_script_name = "lambda_bronze_categories"
-  memory_size = 256
-  timeout = 60
+  memory_size = 1024
+  timeout = 60*2
   tfm_role = module.iam.TFMRole_arn
   etl_lambda_layer_arn = aws_lambda_layer_version.etl_layer.arn
 }
@@ -248,8 +249,9 @@ module "silver_products" {
   source = "./lambdas"
   lambda_fn_name = "silver_products"
   lambda_fn_script_name = "lambda_silver_products"
-  memory_size = 1024
-  timeout = 60*4
+  # backfills build BACKFILL_WORKERS days at the same time, up to BACKFILL_MAX_DAYS per invocation
+  memory_size = 4096
+  timeout = 60*15
   tfm_role = module.iam.TFMRole_arn
   etl_lambda_layer_arn = aws_lambda_layer_version.etl_layer.arn
 }
@@ -0,0 +1,135 @@
+"""
+Before/after benchmark of the parsing and flattening of the raw products of `etl.bronze.products` on a synthetic
+day of NDJSON raw products: `json.loads` per line plus a pandas apply per column against the Arrow JSON reader.
+
+Run from the `src` folder:
+
+    python -m benchmarks.bronze_flatten
+"""
+
+import json
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from etl.bronze import (
+    BRONZE_PRODUCTS_SCHEMA,
+    PRODUCTS_COLUMNS,
+    _flatten_products,
+    _parse_raw_products,
+)
+
+from .stub_server import _fake_search_object
+
+
+def _synthetic_day(n: int) -> bytes:
+    # half of the search objects with the nested "content" shape, half flat
+    search_objects = []
+    for index in range(n):
+        search_object = {**_fake_search_object(index), "category_id": index % 300}
+        if index % 2:
+            search_object = {
+                "id": search_object["id"],
+                "category_id": search_object["category_id"],
+                "content": search_object,
+            }
+        search_objects.append(search_object)
+    return "\n".join(
+        json.dumps({"date": "2024-08-01", "search_objects": search_object})
+        for search_object in search_objects
+    ).encode()
+
+
+def _products_apply(data: bytes) -> pd.DataFrame:
+    # the bronze products before the Arrow reader, Python objects per line and an apply per column
+    df = pd.DataFrame([json.loads(line) for line in data.splitlines()])
+    df["date"] = pd.to_datetime(df["date"])
+    return _flatten_products_apply(df)
+
+
+def _products_arrow(data: bytes) -> pd.DataFrame:
+    return _flatten_products(_parse_raw_products(data, legacy=False)).to_pandas()
+
+
+def _flatten_products_apply(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.assign(
+        date=lambda x: x["date"].apply(lambda x: x.date()),
+        product_id=lambda x: x["search_objects"].apply(lambda x: x["id"]),
+        category_id=lambda x: x["search_objects"].apply(lambda x: x["category_id"]),
+        created_at=lambda x: x["search_objects"].apply(
+            lambda x: (
+                x["content"]["creation_date"] if "content" in x else x["creation_date"]
+            )
+        ),
+        price=lambda x: x["search_objects"].apply(
+            lambda x: x["content"]["price"] if "content" in x else x["price"]
+        ),
+        currency=lambda x: x["search_objects"].apply(
+            lambda x: x["content"]["currency"] if "content" in x else x["currency"]
+        ),
+        title=lambda x: x["search_objects"].apply(
+            lambda x: x["content"]["title"] if "content" in x else x["title"]
+        ),
+        description=lambda x: x["search_objects"].apply(
+            lambda x: (
+                x["content"].get("description", x["content"].get("storytelling"))
+                if "content" in x
+                else x.get("description", x.get("storytelling"))
+            )
+        ),
+        web_slug=lambda x: x["search_objects"].apply(
+            lambda x: x["content"]["web_slug"] if "content" in x else x["web_slug"]
+        ),
+        country_code=lambda x: x["search_objects"].apply(
+            lambda x: (
+                x["content"]["location"]["country_code"]
+                if "content" in x
+                else x["location"]["country_code"]
+            )
+        ),
+        city=lambda x: x["search_objects"].apply(
+            lambda x: (
+                x["content"]["location"]["city"]
+                if "content" in x
+                else x["location"]["city"]
+            )
+        ),
+        postal_code=lambda x: x["search_objects"].apply(
+            lambda x: (
+                x["content"]["location"]["postal_code"]
+                if "content" in x
+                else x["location"]["postal_code"]
+            )
+        ),
+        user_id=lambda x: x["search_objects"].apply(
+            lambda x: x["content"]["user"]["id"] if "content" in x else x["user"]["id"]
+        ),
+    ).loc[:, PRODUCTS_COLUMNS]
+    return df
+
+
+def main(n: int = 1_000_000):
+    data = _synthetic_day(n)
+    timings = {}
+    results = {}
+    for name, read in [
+        ("apply", _products_apply),
+        ("arrow", _products_arrow),
+    ]:
+        start = time.perf_counter()
+        results[name] = read(data)
+        timings[name] = time.perf_counter() - start
+        print(f"{name:>12}: {timings[name]:7.2f}s for {n} search objects")
+    # the apply flattening keeps the raw types, so it is cast to the bronze schema to compare
+    pd.testing.assert_frame_equal(
+        pa.Table.from_pandas(results["apply"], preserve_index=False)
+        .cast(BRONZE_PRODUCTS_SCHEMA)
+        .to_pandas(),
+        results["arrow"],
+    )
+    print(f"speedup: {timings['apply'] / timings['arrow']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
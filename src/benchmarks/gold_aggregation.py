@@ -0,0 +1,168 @@
+"""
+Benchmark of the gold categories and locations aggregations on a synthetic window of GOLD_TIMEFRAME_LIMIT days:
+the six groupby passes, concats and merges they used against `etl.grouping_sets.aggregate_grouping_sets`.
+
+Run from the `src` folder:
+
+    python -m benchmarks.gold_aggregation --rows 1000000 5000000
+"""
+
+import argparse
+import datetime
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from etl.gold import GOLD_AGGREGATIONS
+from etl.grouping_sets import aggregate_grouping_sets
+from etl.utils import GOLD_TIMEFRAME_LIMIT
+
+DAY = datetime.datetime(2024, 8, 30)
+ROWS = (1_000_000, 3_000_000, 5_000_000)
+CATEGORY_KEYS = ["date", "category_display_name"]
+LOCATION_KEYS = ["date", "city_display_name", "postal_code", "location_display_name"]
+
+
+def _synthetic_window(n: int) -> pd.DataFrame:
+    # the silver products of the window with their display names, which are not part of the comparison
+    rng = np.random.default_rng(0)
+    dates = [
+        (DAY - datetime.timedelta(i)).strftime("%Y-%m-%d")
+        for i in range(GOLD_TIMEFRAME_LIMIT)
+    ][::-1]
+    categories = rng.integers(0, 300, n)
+    postal_codes = rng.integers(0, 2000, n)
+    # products without a postal code are left out of their location but not of the total
+    postal_codes[rng.random(n) < 0.05] = -1
+    return pd.DataFrame(
+        {
+            "date": pd.Categorical.from_codes(rng.integers(0, len(dates), n), dates),
+            "category_display_name": pd.Categorical.from_codes(
+                categories,
+                [
+                    f"Category {i} (Root {i // 15} > Category {i} - {i})"
+                    for i in range(300)
+                ],
+            ),
+            "category_parent_display_name": pd.Categorical.from_codes(
+                categories // 15, [f"Root {i}" for i in range(20)]
+            ),
+            "city_display_name": pd.Categorical.from_codes(
+                np.where(postal_codes < 0, -1, postal_codes // 20),
+                [f"City {i}, ES" for i in range(100)],
+            ),
+            "postal_code": pd.Categorical.from_codes(
+                postal_codes, [f"{i:05d}" for i in range(2000)]
+            ),
+            "location_display_name": pd.Categorical.from_codes(
+                postal_codes, [f"City {i // 20}, ES ({i:05d})" for i in range(2000)]
+            ),
+            "product_id": [f"p{i:09d}" for i in range(n)],
+            "price": rng.integers(1, 100_000, n) / 100,
+            "days_since_creation": rng.integers(0, 3650, n).astype("int16"),
+        }
+    )
+
+
+def _aggregate_legacy(products_silver: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    # the gold aggregation before the grouping sets: price, count and duration by keys and by date, then merged
+    total = {key: "--" for key in keys if key != "date"}
+    price_evolution = pd.concat(
+        [
+            products_silver.groupby(keys, observed=True)["price"]
+            .agg(price_mean="mean", price_max="max", price_min="min")
+            .reset_index(),
+            products_silver.groupby("date", observed=True)["price"]
+            .agg(price_mean="mean", price_max="max", price_min="min")
+            .reset_index()
+            .assign(**total),
+        ]
+    )
+    count_evolution = pd.concat(
+        [
+            products_silver.groupby(keys, observed=True)["product_id"]
+            .count()
+            .reset_index(),
+            products_silver.groupby("date", observed=True)["product_id"]
+            .count()
+            .reset_index()
+            .assign(**total),
+        ]
+    )
+    item_duration_evolution = pd.concat(
+        [
+            products_silver.groupby(keys, observed=True)["days_since_creation"]
+            .mean()
+            .reset_index(),
+            products_silver.groupby("date", observed=True)["days_since_creation"]
+            .mean()
+            .reset_index()
+            .assign(**total),
+        ]
+    )
+    return price_evolution.merge(count_evolution, on=keys).merge(
+        item_duration_evolution, on=keys
+    )
+
+
+def _categories_legacy(products_silver: pd.DataFrame) -> pd.DataFrame:
+    return _aggregate_legacy(products_silver, CATEGORY_KEYS).merge(
+        products_silver[
+            ["category_display_name", "category_parent_display_name"]
+        ].drop_duplicates(),
+        on="category_display_name",
+    )
+
+
+def _categories(products_silver: pd.DataFrame) -> pd.DataFrame:
+    return aggregate_grouping_sets(
+        products_silver,
+        [CATEGORY_KEYS + ["category_parent_display_name"]],
+        GOLD_AGGREGATIONS,
+    )
+
+
+def _locations_legacy(products_silver: pd.DataFrame) -> pd.DataFrame:
+    return _aggregate_legacy(products_silver, LOCATION_KEYS)
+
+
+def _locations(products_silver: pd.DataFrame) -> pd.DataFrame:
+    return aggregate_grouping_sets(
+        products_silver, [LOCATION_KEYS, ["date"]], GOLD_AGGREGATIONS
+    )
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    returned = function(*args)
+    return returned, time.perf_counter() - start
+
+
+def main(rows=ROWS):
+    print(
+        f"{'rows':>10} {'table':>10} {'legacy':>9} {'grouping sets':>14} {'speedup':>8}"
+    )
+    for n in rows:
+        products_silver = _synthetic_window(n)
+        for table, legacy, grouping_sets in [
+            ("categories", _categories_legacy, _categories),
+            ("locations", _locations_legacy, _locations),
+        ]:
+            before, legacy_time = _timed(legacy, products_silver)
+            after, grouping_sets_time = _timed(grouping_sets, products_silver)
+            np.testing.assert_allclose(
+                before["product_id"].to_numpy(dtype=float),
+                after["product_id"].to_numpy(dtype=float),
+            )
+            print(
+                f"{n:>10} {table:>10} {legacy_time:>8.2f}s {grouping_sets_time:>13.2f}s {legacy_time / grouping_sets_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=list(ROWS))
+    args = parser.parse_args()
+    main(args.rows)
@@ -0,0 +1,132 @@
+"""
+Benchmark of `etl.raw.download_products_by_category` against a local stub of the products endpoint.
+
+Run from the `src` folder:
+
+    python -m benchmarks.raw_download
+"""
+
+import asyncio
+import datetime
+import time
+import tracemalloc
+from itertools import chain
+from typing import Callable, Dict
+
+import requests
+
+from etl.raw import TokenBucket, _generate_device_id, download_products_by_category
+from etl.utils import HEADERS, MAX_PRODUCTS, PRODUCTS_PAGE_SIZE, URLS
+
+from .stub_server import STATS, WALLAPOP_API, products_category_app, run_stub_server
+
+CATEGORY = {
+    "category_id": 13200,
+    "category_path_root": "general",
+    "category_search_path": "category_ids=13200&object_type_ids=10393",
+}
+# far above the production limit, so the stub latency and not the token bucket bounds the engines
+REQUESTS_PER_SECOND = 1000
+
+
+async def _threaded_download(url: str, max_products: int) -> Dict:
+    # the engine used before the aiohttp one: a thread and a connection per page
+    def _get(page_url: str):
+        return requests.get(
+            page_url, headers={**HEADERS, "X-DeviceID": _generate_device_id()}
+        ).json()["search_objects"]
+
+    results = await asyncio.gather(
+        *[
+            asyncio.to_thread(
+                _get,
+                url.format(
+                    category_path_root=CATEGORY["category_path_root"],
+                    category_search_path=CATEGORY["category_search_path"],
+                    start=start,
+                ),
+            )
+            for start in range(0, max_products, PRODUCTS_PAGE_SIZE)
+        ]
+    )
+    return {"search_objects": list(chain.from_iterable(results))}
+
+
+async def _pooled_download(url: str, max_products: int) -> Dict:
+    return await download_products_by_category(
+        datetime.datetime.today(),
+        max_products=max_products,
+        url=url,
+        window_size=None,
+        rate_limiter=TokenBucket(REQUESTS_PER_SECOND),
+        **CATEGORY,
+    )
+
+
+async def _windowed_download(url: str, max_products: int) -> Dict:
+    return await download_products_by_category(
+        datetime.datetime.today(),
+        max_products=max_products,
+        url=url,
+        rate_limiter=TokenBucket(REQUESTS_PER_SECOND),
+        **CATEGORY,
+    )
+
+
+ENGINES = {
+    "threaded": _threaded_download,
+    "pooled": _pooled_download,
+    "windowed": _windowed_download,
+}
+
+
+async def _measure(
+    name: str, download: Callable, url: str, max_products: int, stats: Dict
+):
+    requests_before = stats["requests"]
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = await download(url, max_products)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>10}: {elapsed:7.2f}s  {len(result['search_objects']):>6} products  "
+        f"{stats['requests'] - requests_before:>4} requests  "
+        f"{result.get('stats', {}).get('failed_pages', 0):>3} failed pages  "
+        f"peak memory {peak / 2**20:7.1f} MiB"
+    )
+
+
+async def main(
+    total_products: int = 5000,
+    max_products: int = MAX_PRODUCTS,
+    latency: float = 0.05,
+    throttle_rate: float = 0.0,
+    error_rate: float = 0.0,
+    engines: Dict[str, Callable] = ENGINES,
+):
+    app = products_category_app(
+        total_products=total_products,
+        latency=latency,
+        throttle_rate=throttle_rate,
+        error_rate=error_rate,
+    )
+    async with run_stub_server(app) as base_url:
+        url = URLS["products_category"].replace(WALLAPOP_API, base_url)
+        stats = app[STATS]
+        for name, download in engines.items():
+            await _measure(name, download, url, max_products, stats)
+        print(f"stub server stats: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    # the threaded engine has no retries, so only the aiohttp ones are run against the throttling stub
+    asyncio.run(
+        main(
+            throttle_rate=0.1,
+            error_rate=0.02,
+            engines={"pooled": _pooled_download, "windowed": _windowed_download},
+        )
+    )
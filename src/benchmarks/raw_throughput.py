@@ -0,0 +1,192 @@
+"""
+Throughput benchmark of `etl.raw` against a local replay of the Wallapop API.
+
+Record cassettes of the real API once (it is the only mode that hits it):
+
+    python -m benchmarks.raw_throughput --record --cassettes /tmp/cassettes
+
+Then benchmark against them, or against synthetic categories and pages if no cassettes are given:
+
+    python -m benchmarks.raw_throughput --cassettes /tmp/cassettes --pages 100 --latency 0.1 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import datetime
+import pathlib
+import statistics
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+
+from etl.raw import TokenBucket, download_categories, download_products_by_category
+from etl.utils import PRODUCTS_PAGE_SIZE, URLS
+
+from .stub_server import (
+    STATS,
+    WALLAPOP_API,
+    record_app,
+    replay_app,
+    run_stub_server,
+)
+
+CATEGORY = {
+    "category_id": 13200,
+    "category_path_root": "general",
+    "category_search_path": "category_ids=13200&object_type_ids=10393",
+}
+CONCURRENCY_LEVELS = (5, 10, 20, 50)
+# far above the production limit, so the concurrency and not the token bucket bounds the throughput
+REQUESTS_PER_SECOND = 10000
+
+
+def _latency_trace(latencies: List[float]) -> aiohttp.TraceConfig:
+    async def _on_request_start(session, context, params):
+        context.start = time.perf_counter()
+
+    async def _on_request_end(session, context, params):
+        latencies.append(time.perf_counter() - context.start)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_on_request_start)
+    trace.on_request_end.append(_on_request_end)
+    return trace
+
+
+def _report(name: str, elapsed: float, latencies: List[float], peak: int) -> Dict:
+    percentiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    )
+    returned = {
+        "name": name,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentiles[49] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+        "peak_memory_mib": peak / 2**20,
+    }
+    print(
+        f"{name:>24}: {returned['requests']:>5} requests  "
+        f"{returned['requests_per_second']:8.1f} req/s  "
+        f"p50 {returned['p50_ms']:7.1f} ms  p99 {returned['p99_ms']:7.1f} ms  "
+        f"peak memory {returned['peak_memory_mib']:7.1f} MiB"
+    )
+    return returned
+
+
+async def _bench_categories(base_url: str) -> Dict:
+    url = URLS["categories"].replace(WALLAPOP_API, base_url)
+    tracemalloc.start()
+    start = time.perf_counter()
+    # requests is blocking, so it cannot run in the loop that serves the stub
+    await asyncio.to_thread(download_categories, datetime.datetime.today(), url=url)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _report("download_categories", elapsed, [elapsed], peak)
+
+
+async def _bench_products(
+    base_url: str, max_concurrency: int, max_products: int
+) -> Dict:
+    latencies = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    await download_products_by_category(
+        datetime.datetime.today(),
+        max_products=max_products,
+        max_concurrency=max_concurrency,
+        window_size=max_concurrency,
+        url=URLS["products_category"].replace(WALLAPOP_API, base_url),
+        rate_limiter=TokenBucket(REQUESTS_PER_SECOND),
+        trace_configs=[_latency_trace(latencies)],
+        **CATEGORY,
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _report(f"products concurrency={max_concurrency}", elapsed, latencies, peak)
+
+
+async def record(cassette_dir: pathlib.Path, max_products: int) -> None:
+    """
+    Records the categories and the pages of CATEGORY from the real Wallapop API.
+    """
+    app = record_app(cassette_dir)
+    async with run_stub_server(app) as base_url:
+        await asyncio.to_thread(
+            download_categories,
+            datetime.datetime.today(),
+            url=URLS["categories"].replace(WALLAPOP_API, base_url),
+        )
+        await download_products_by_category(
+            datetime.datetime.today(),
+            max_products=max_products,
+            url=URLS["products_category"].replace(WALLAPOP_API, base_url),
+            **CATEGORY,
+        )
+    print(f"Recorded {app[STATS]['requests']} responses in {cassette_dir}")
+
+
+async def main(
+    cassette_dir: Optional[pathlib.Path] = None,
+    pages: Optional[int] = 100,
+    latency: float = 0.05,
+    throttle_rate: float = 0.0,
+    error_rate: float = 0.0,
+    concurrency_levels: Sequence[int] = CONCURRENCY_LEVELS,
+) -> List[Dict]:
+    """
+    Benchmarks `download_categories` and `download_products_by_category` at every concurrency level.
+
+    Returns:
+        List[Dict]: The requests/s, p50/p99 page latency and peak memory of every run.
+    """
+    app = replay_app(
+        cassette_dir,
+        pages=pages,
+        latency=latency,
+        throttle_rate=throttle_rate,
+        error_rate=error_rate,
+    )
+    # one more page than the category has, so the end of the category is always found
+    max_products = ((pages or 0) + 1) * PRODUCTS_PAGE_SIZE
+    async with run_stub_server(app) as base_url:
+        results = [await _bench_categories(base_url)]
+        for max_concurrency in concurrency_levels:
+            results.append(
+                await _bench_products(base_url, max_concurrency, max_products)
+            )
+    print(f"stub server stats: {app[STATS]}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--record", action="store_true")
+    parser.add_argument("--cassettes", type=pathlib.Path)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=list(CONCURRENCY_LEVELS)
+    )
+    args = parser.parse_args()
+    if args.record:
+        if args.cassettes is None:
+            parser.error("--record needs --cassettes")
+        asyncio.run(record(args.cassettes, args.pages * PRODUCTS_PAGE_SIZE))
+    else:
+        asyncio.run(
+            main(
+                args.cassettes,
+                pages=args.pages,
+                latency=args.latency,
+                throttle_rate=args.throttle_rate,
+                error_rate=args.error_rate,
+                concurrency_levels=args.concurrency,
+            )
+        )
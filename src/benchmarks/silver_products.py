@@ -0,0 +1,123 @@
+"""
+Scaling benchmark of `etl.silver.build_products` against the silver build it replaced, on synthetic bronze days.
+
+Run from the `src` folder:
+
+    python -m benchmarks.silver_products --rows 100000 1000000 5000000
+"""
+
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from etl.category_tree import CategoryTree
+from etl.silver import SILVER_PRODUCTS_COLUMNS, build_products
+
+DAY = datetime.datetime(2024, 8, 1)
+ROWS = (100_000, 500_000, 1_000_000, 2_000_000, 5_000_000)
+
+
+def _synthetic_tree(roots: int = 20, children: int = 15) -> CategoryTree:
+    return CategoryTree.from_categories(
+        [
+            {
+                "id": root,
+                "name": f"Root {root}",
+                "vertical_id": "consumer_goods",
+                "subcategories": [
+                    {"id": root * 1000 + child, "name": f"Category {child}"}
+                    for child in range(children)
+                ],
+            }
+            for root in range(1, roots + 1)
+        ]
+    )
+
+
+def _synthetic_bronze(n: int, tree: CategoryTree) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    leaves = tree.category_id[tree.leaves()]
+    created_at = pd.Timestamp(DAY, tz="UTC") - pd.to_timedelta(
+        rng.integers(0, 365 * 24 * 3600, n), unit="s"
+    )
+    return pd.DataFrame(
+        {
+            "product_id": [f"p{i:09d}" for i in range(n)],
+            "user_id": pd.Categorical.from_codes(
+                rng.integers(0, 10_000, n), [f"u{i}" for i in range(10_000)]
+            ),
+            "category_id": rng.choice(leaves, n).astype("int32"),
+            "created_at": created_at,
+            "title": "Synthetic product",
+            "web_slug": "synthetic-product",
+            "price": rng.integers(1, 100_000, n) / 100,
+            "currency": pd.Categorical(["EUR"] * n),
+            "country_code": pd.Categorical(["ES"] * n),
+            "city": pd.Categorical(["Madrid"] * n),
+            "postal_code": pd.Categorical.from_codes(
+                rng.integers(0, 1000, n), [f"{i:05d}" for i in range(1000)]
+            ),
+            "date": pd.Categorical([DAY.strftime("%Y-%m-%d")] * n),
+        }
+    )
+
+
+def _build_products_apply(
+    products_bronze: pd.DataFrame, categories_bronze: pd.DataFrame
+) -> pd.DataFrame:
+    # the silver build before this one: index merge and a strptime per row over ISO strings
+    products_bronze = products_bronze.assign(
+        created_at=products_bronze["created_at"].dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    )
+    return (
+        products_bronze.set_index("category_id")
+        .merge(
+            categories_bronze.set_index("category_id"),
+            left_index=True,
+            right_index=True,
+            how="left",
+        )
+        .reset_index()
+        .loc[:, SILVER_PRODUCTS_COLUMNS]
+        .assign(
+            days_since_creation=lambda x: x["created_at"].apply(
+                lambda x: (
+                    DAY.date()
+                    - datetime.datetime.strptime(x.split("T")[0], "%Y-%m-%d").date()
+                ).days
+            )
+        )
+    )
+
+
+def main(rows=ROWS):
+    tree = _synthetic_tree()
+    categories_bronze = tree.to_frame().assign(
+        category_name=tree.name, category_hierarchy=tree.hierarchy
+    )[["category_id", "category_name", "category_hierarchy"]]
+    print(f"{'rows':>10} {'apply':>9} {'vectorized':>11} {'speedup':>8}")
+    for n in rows:
+        products_bronze = _synthetic_bronze(n, tree)
+        start = time.perf_counter()
+        before = _build_products_apply(products_bronze, categories_bronze)
+        apply_time = time.perf_counter() - start
+        start = time.perf_counter()
+        after = build_products(products_bronze, tree, DAY)
+        vectorized_time = time.perf_counter() - start
+        np.testing.assert_array_equal(
+            before["days_since_creation"].to_numpy(),
+            after["days_since_creation"].to_numpy(),
+        )
+        print(
+            f"{n:>10} {apply_time:>8.2f}s {vectorized_time:>10.2f}s {apply_time / vectorized_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=list(ROWS))
+    args = parser.parse_args()
+    main(args.rows)
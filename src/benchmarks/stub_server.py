@@ -0,0 +1,248 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import pathlib
+import random
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from etl.raw import _generate_device_id
+from etl.utils import HEADERS, PRODUCTS_PAGE_SIZE
+
+WALLAPOP_API = "https://api.wallapop.com"
+STATS = web.AppKey("stats", Dict[str, int])
+UPSTREAM_SESSION = web.AppKey("upstream_session", aiohttp.ClientSession)
+
+
+def _fake_search_object(index: int) -> Dict:
+    return {
+        "id": f"stub{index:08d}",
+        "title": f"Stub product {index}",
+        "description": "Local stub product",
+        "price": float(index % 1000),
+        "currency": "EUR",
+        "web_slug": f"stub-product-{index}",
+        "creation_date": "2024-08-01T10:00:00.000Z",
+        "location": {"country_code": "ES", "city": "Madrid", "postal_code": "28001"},
+        "user": {"id": f"user{index % 500}"},
+    }
+
+
+def _fake_categories(roots: int = 20, subcategories: int = 15) -> Dict:
+    # a tree shaped like the real one, roots with a level of subcategories
+    return {
+        "categories": [
+            {
+                "id": root,
+                "name": f"Root {root}",
+                "vertical_id": f"vertical{root}",
+                "subcategories": [
+                    {
+                        "id": 1000 * root + i,
+                        "name": f"Category {1000 * root + i}",
+                        "vertical_id": f"vertical{root}",
+                        "subcategories": [],
+                    }
+                    for i in range(subcategories)
+                ],
+            }
+            for root in range(1, roots + 1)
+        ]
+    }
+
+
+def _search_page(start: int, total_products: int) -> List[Dict]:
+    return [
+        _fake_search_object(index)
+        for index in range(start, min(start + PRODUCTS_PAGE_SIZE, total_products))
+    ]
+
+
+def _cassette_path(cassette_dir: pathlib.Path, request: web.Request) -> pathlib.Path:
+    # the device ID and the rest of the headers change on every request, so only the URL identifies it
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query.items()))
+    name = hashlib.sha1(f"{request.path}?{query}".encode("utf-8")).hexdigest()
+    return cassette_dir / f"{name}.json"
+
+
+def _faults_middleware(
+    latency: float, throttle_rate: float, error_rate: float, retry_after: int
+):
+    @web.middleware
+    async def _faults(request: web.Request, handler) -> web.StreamResponse:
+        request.app[STATS]["requests"] += 1
+        await asyncio.sleep(latency)
+        draw = random.random()
+        if draw < throttle_rate:
+            request.app[STATS]["throttled"] += 1
+            return web.json_response(
+                {"error": "Too Many Requests"},
+                status=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+        if draw < throttle_rate + error_rate:
+            request.app[STATS]["errors"] += 1
+            return web.json_response({"error": "Service Unavailable"}, status=503)
+        return await handler(request)
+
+    return _faults
+
+
+def _stub_app(
+    latency: float, throttle_rate: float, error_rate: float, retry_after: int
+) -> web.Application:
+    app = web.Application(
+        middlewares=[
+            _faults_middleware(latency, throttle_rate, error_rate, retry_after)
+        ]
+    )
+    app[STATS] = {"requests": 0, "throttled": 0, "errors": 0}
+    return app
+
+
+def products_category_app(
+    total_products: int = 2000,
+    latency: float = 0.05,
+    throttle_rate: float = 0.0,
+    error_rate: float = 0.0,
+    retry_after: int = 1,
+) -> web.Application:
+    """
+    Builds an aiohttp application that mimics the `products_category` endpoint of the Wallapop API.
+
+    Args:
+        total_products (int): The number of products the category has. Pages past it are returned empty.
+        latency (float): The seconds every response is delayed.
+        throttle_rate (float): The probability of answering a request with a 429 and a `Retry-After` header.
+        error_rate (float): The probability of answering a request with a 503.
+        retry_after (int): The seconds sent in the `Retry-After` header of the 429 responses.
+
+    Returns:
+        web.Application: The stub application. `app[STATS]` counts the requests it has served, throttled and failed.
+    """
+
+    async def _search(request: web.Request) -> web.Response:
+        start = int(request.query.get("start", 0))
+        return web.json_response(
+            {"search_objects": _search_page(start, total_products)}
+        )
+
+    app = _stub_app(latency, throttle_rate, error_rate, retry_after)
+    app.router.add_get("/api/v3/{category_path_root}/search", _search)
+    return app
+
+
+def record_app(
+    cassette_dir: pathlib.Path, upstream: str = WALLAPOP_API
+) -> web.Application:
+    """
+    Builds an aiohttp application that proxies every request to the Wallapop API and stores the responses as
+    cassettes in `cassette_dir`, one JSON file per URL, to be served later by `replay_app`.
+
+    Args:
+        cassette_dir (pathlib.Path): The folder where the cassettes are written.
+        upstream (str): The base URL the requests are forwarded to. Defaults to WALLAPOP_API.
+
+    Returns:
+        web.Application: The recording application.
+    """
+    cassette_dir.mkdir(parents=True, exist_ok=True)
+
+    async def _upstream_session(app: web.Application) -> AsyncIterator[None]:
+        async with aiohttp.ClientSession(
+            headers={**HEADERS, "X-DeviceID": _generate_device_id()}
+        ) as session:
+            app[UPSTREAM_SESSION] = session
+            yield
+
+    async def _record(request: web.Request) -> web.Response:
+        request.app[STATS]["requests"] += 1
+        async with request.app[UPSTREAM_SESSION].get(
+            f"{upstream}{request.path_qs}"
+        ) as response:
+            body = await response.json(content_type=None)
+            status = response.status
+        _cassette_path(cassette_dir, request).write_text(
+            json.dumps({"url": request.path_qs, "status": status, "body": body})
+        )
+        return web.json_response(body, status=status)
+
+    app = web.Application()
+    app[STATS] = {"requests": 0}
+    app.cleanup_ctx.append(_upstream_session)
+    app.router.add_get("/{tail:.*}", _record)
+    return app
+
+
+def replay_app(
+    cassette_dir: Optional[pathlib.Path] = None,
+    pages: Optional[int] = None,
+    latency: float = 0.05,
+    throttle_rate: float = 0.0,
+    error_rate: float = 0.0,
+    retry_after: int = 1,
+) -> web.Application:
+    """
+    Builds an aiohttp application that replays the cassettes stored by `record_app`.
+
+    Search pages and the categories without a cassette are synthesized, so a category can be made as large as
+    needed and the benchmarks run without recording first.
+
+    Args:
+        cassette_dir (Optional[pathlib.Path]): The folder of the cassettes. If None, every search page is synthesized.
+        pages (Optional[int]): The number of full pages every category has. Pages past it are returned empty, even
+            if they were recorded. If None, only the recorded pages are served and the rest are returned empty.
+        latency (float): The seconds every response is delayed.
+        throttle_rate (float): The probability of answering a request with a 429 and a `Retry-After` header.
+        error_rate (float): The probability of answering a request with a 503.
+        retry_after (int): The seconds sent in the `Retry-After` header of the 429 responses.
+
+    Returns:
+        web.Application: The replay application. `app[STATS]` counts the requests it has served, throttled and failed.
+    """
+
+    async def _replay(request: web.Request) -> web.Response:
+        is_search = request.path.endswith("/search")
+        start = int(request.query.get("start", 0))
+        if is_search and pages is not None and start >= pages * PRODUCTS_PAGE_SIZE:
+            return web.json_response({"search_objects": []})
+        if (
+            cassette_dir is not None
+            and (cassette := _cassette_path(cassette_dir, request)).exists()
+        ):
+            recorded = json.loads(cassette.read_text())
+            return web.json_response(recorded["body"], status=recorded["status"])
+        if is_search:
+            total_products = (pages or 0) * PRODUCTS_PAGE_SIZE
+            return web.json_response(
+                {"search_objects": _search_page(start, total_products)}
+            )
+        if request.path == "/api/v3/categories":
+            return web.json_response(_fake_categories())
+        return web.json_response({"error": "Not recorded"}, status=404)
+
+    app = _stub_app(latency, throttle_rate, error_rate, retry_after)
+    app.router.add_get("/{tail:.*}", _replay)
+    return app
+
+
+@contextlib.asynccontextmanager
+async def run_stub_server(app: web.Application) -> AsyncIterator[str]:
+    """
+    Serves the given application on a free local port.
+
+    Yields:
+        str: The base URL of the server, to be used in place of WALLAPOP_API.
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
@@ -1,204 +1,559 @@
 import datetime
-from itertools import chain
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
 import pandas as pd
+from .category_tree import CategoryTree
+from .parquet_layout import ParquetLayout, S3PartitionWriter
 from .utils import (
+    BRONZE_BATCH_BYTES,
+    BRONZE_WORKERS,
     S3_CLIENT,
+    S3_BUCKET_BRONZE_CATEGORIES_CACHE_PATH,
+    S3_BUCKET_BRONZE_CATEGORIES_MANIFEST_PATH,
+    S3_BUCKET_BRONZE_PRODUCTS_PATH,
     S3_BUCKET_DATA,
     S3_BUCKET_RAW_CATEGORY_PATH,
     S3_BUCKET_RAW_PRODUCTS_CATEGORY_PATH,
+    load_json_from_s3,
+    open_s3_object,
+    save_json_to_s3,
 )
+import hashlib
 import json
-from functools import reduce
+import multiprocessing
 import concurrent
 import concurrent.futures
 import awswrangler as wr
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pa_json
 
-
-def _flatten_reduce_lambda(matrix):
-    return list(reduce(lambda x, y: x + y, matrix, []))
-
-
-def _extract_subcategories(category, category_id, path=""):
-    path += " > " + category["name"] if path != "" else category["name"]
-    if len(category["subcategories"]) == 0:
-        return [
-            {
-                "category_name": category["name"],
-                "category_id": category["id"],
-                "category_path_root": "general",
-                "category_search_path": f'category_ids={category_id}&object_type_ids={category["id"]}',
-                "parent_id": category["parent_id"],
-                "category_hierarchy": path,
-            }
-        ]
-    categories = [
-        _extract_subcategories(subcategory, category_id, path)
-        for subcategory in category["subcategories"]
+_LOCATION = pa.struct(
+    [
+        ("country_code", pa.string()),
+        ("city", pa.string()),
+        ("postal_code", pa.string()),
     ]
-    return _flatten_reduce_lambda(categories)
+)
+_SEARCH_OBJECT_CONTENT_FIELDS = [
+    ("creation_date", pa.string()),
+    ("price", pa.float64()),
+    ("currency", pa.string()),
+    ("title", pa.string()),
+    ("description", pa.string()),
+    ("storytelling", pa.string()),
+    ("web_slug", pa.string()),
+    ("location", _LOCATION),
+    ("user", pa.struct([("id", pa.string())])),
+]
+# the search object fields kept in bronze, either nested in "content" or flat
+RAW_SEARCH_OBJECT_TYPE = pa.struct(
+    [
+        ("id", pa.string()),
+        ("category_id", pa.int64()),
+        ("unchanged", pa.bool_()),
+        ("content", pa.struct(_SEARCH_OBJECT_CONTENT_FIELDS)),
+        *_SEARCH_OBJECT_CONTENT_FIELDS,
+    ]
+)
+_ID_FIELD_INDEX = RAW_SEARCH_OBJECT_TYPE.get_field_index("id")
+_UNCHANGED_FIELD_INDEX = RAW_SEARCH_OBJECT_TYPE.get_field_index("unchanged")
+RAW_PRODUCTS_LINE_SCHEMA = pa.schema(
+    [("date", pa.string()), ("search_objects", RAW_SEARCH_OBJECT_TYPE)]
+)
+RAW_PRODUCTS_DOCUMENT_SCHEMA = pa.schema(
+    [("date", pa.string()), ("search_objects", pa.list_(RAW_SEARCH_OBJECT_TYPE))]
+)
+# low cardinality strings are dictionary encoded, read back by pandas as categoricals. Product and user IDs
+# are alphanumeric so they stay strings, and prices keep float64 to be exact to the cent
+_DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+BRONZE_PRODUCTS_SCHEMA = pa.schema(
+    [
+        ("date", pa.date32()),
+        ("product_id", pa.string()),
+        ("category_id", pa.int32()),
+        ("user_id", pa.string()),
+        ("created_at", pa.timestamp("ms", tz="UTC")),
+        ("price", pa.float64()),
+        ("currency", _DICTIONARY),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("web_slug", pa.string()),
+        ("country_code", _DICTIONARY),
+        ("city", _DICTIONARY),
+        ("postal_code", _DICTIONARY),
+    ]
+)
+PRODUCTS_COLUMNS = BRONZE_PRODUCTS_SCHEMA.names
+HIERARCHY_LEVELS = 5
+CATEGORIES_COLUMNS = [
+    "category_name",
+    "category_id",
+    "category_path_root",
+    "category_search_path",
+    "parent_id",
+    "category_hierarchy",
+    "hierarchy_len",
+    *(f"category_hierarchy_{level}" for level in range(HIERARCHY_LEVELS)),
+]
 
 
-def _process_category_day(json_file: str) -> List[Dict]:
-    categories = []
+def _process_category_day(json_file: str) -> CategoryTree:
     obj = S3_CLIENT.get_object(Bucket=S3_BUCKET_DATA, Key=json_file)
     content = obj["Body"].read().decode("utf-8")
     data = json.loads(content)
-    for category in data["categories"]:
-        if category["subcategories"]:
-            categories.extend(_extract_subcategories(category, category["id"]))
-        else:
-            categories.append(
-                {
-                    "category_name": category["name"],
-                    "category_id": category["id"],
-                    "category_path_root": category["vertical_id"],
-                    "category_search_path": f'category_ids={category["id"]}',
-                    "parent_id": None,
-                    "category_hierarchy": category["name"],
-                }
-            )
-    return categories
+    return CategoryTree.from_categories(data["categories"])
+
+
+def _list_raw_categories_files() -> Dict[str, str]:
+    paginator = S3_CLIENT.get_paginator("list_objects_v2")
+    return {
+        obj["Key"]: obj["ETag"]
+        for page in paginator.paginate(
+            Bucket=S3_BUCKET_DATA, Prefix=S3_BUCKET_RAW_CATEGORY_PATH + "/"
+        )
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith(".json")
+    }
 
 
-def categories() -> pd.DataFrame:
+def _process_categories_days(json_files: List[str]) -> List[CategoryTree]:
+    # in key order, so the categories of later days win when the trees are merged
+    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+        return list(executor.map(_process_category_day, sorted(json_files)))
+
+
+def _categories_rows(tree: CategoryTree) -> pd.DataFrame:
+    # a row per leaf category, with the name of its ancestor at each level of the hierarchy
+    leaves = tree.leaves()
+    depth = tree.depth[leaves]
+    category_ids = pd.Series(tree.category_id[leaves]).astype(str)
+    root_ids = pd.Series(tree.category_id[tree.root[leaves]]).astype(str)
+    rows = pd.DataFrame(
+        {
+            "category_name": tree.name[leaves],
+            "category_id": tree.category_id[leaves],
+            "category_path_root": np.where(
+                depth > 0, "general", tree.vertical_id[leaves]
+            ),
+            "category_search_path": np.where(
+                depth > 0,
+                "category_ids=" + root_ids + "&object_type_ids=" + category_ids,
+                "category_ids=" + category_ids,
+            ),
+            "parent_id": pd.Series(tree.category_id[tree.parent[leaves]]).where(
+                depth > 0
+            ),
+            "category_hierarchy": tree.hierarchy[leaves],
+            "hierarchy_len": depth.astype("int64") + 1,
+        }
+    )
+    ancestors = tree.ancestors[leaves]
+    for level in range(HIERARCHY_LEVELS):
+        nodes = (
+            ancestors[:, level]
+            if level < ancestors.shape[1]
+            else np.full(len(leaves), -1)
+        )
+        rows[f"category_hierarchy_{level}"] = np.where(
+            nodes >= 0, tree.name[nodes], "--"
+        )
+    return rows
+
+
+def categories(use_cache: bool = True) -> pd.DataFrame:
     """
     Retrieves all JSON files from the S3 bucket with the given prefix and processes each file to extract category data.
     Returns a pandas DataFrame containing the processed category data, with columns for category name, category ID, category path root,
     category search path, parent ID, and category hierarchy. The DataFrame also includes additional columns for each level of the category
     hierarchy, with default values of "--" for empty levels. The DataFrame is sorted by the hierarchy length in descending order.
 
+    The build is incremental: a manifest in S3 keeps the key and ETag of every raw file already processed and the
+    flattened table they produced. Only raw files missing from the manifest are downloaded and flattened, and their
+    categories are merged into that table, so the daily cost depends on the new files and not on the age of the
+    datalake. If a processed file was rewritten or deleted, the table is rebuilt from every raw file.
+
+    The union of the category trees of every day is compiled into a `etl.category_tree.CategoryTree` and saved
+    as the tree of the bronze layer, used by silver and gold to resolve names, hierarchies and roots by ID.
+
+    Args:
+        use_cache (bool): Whether to reuse the table of the manifest. False rebuilds it from every raw file. Defaults to True.
+
     Returns:
         pd.DataFrame: The processed category data.
     """
-    response = S3_CLIENT.list_objects_v2(
-        Bucket=S3_BUCKET_DATA, Prefix=S3_BUCKET_RAW_CATEGORY_PATH + "/"
-    )
-    json_files = [
-        obj["Key"]
-        for obj in response.get("Contents", [])
-        if obj["Key"].endswith(".json")
-    ]
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [
-            executor.submit(_process_category_day, json_file)
-            for json_file in json_files
-        ]
-        categories: List = list(
-            chain.from_iterable(
-                [future.result() for future in concurrent.futures.as_completed(futures)]
-            )
+    raw_files = _list_raw_categories_files()
+    raw_hash = hashlib.sha256(
+        "\n".join(sorted(f"{key}:{etag}" for key, etag in raw_files.items())).encode(
+            "utf-8"
         )
+    ).hexdigest()
+    manifest = (
+        load_json_from_s3(S3_BUCKET_DATA, S3_BUCKET_BRONZE_CATEGORIES_MANIFEST_PATH)
+        if use_cache
+        else None
+    )
+    if manifest is not None and manifest["hash"] == raw_hash:
+        return wr.s3.read_parquet(manifest["table"])
+    processed = manifest["files"] if manifest is not None else {}
+    if any(raw_files.get(key) != etag for key, etag in processed.items()):
+        print("Processed raw categories files changed, rebuilding bronze categories")
+        processed = {}
+    new_files = [key for key in raw_files if key not in processed]
+    print(f"Processing {len(new_files)} new raw categories files")
+    trees = _process_categories_days(new_files)
+    frames = [_categories_rows(tree) for tree in trees]
+    if processed:
+        trees.insert(0, CategoryTree.load(manifest["tree"]))
+        frames.insert(0, wr.s3.read_parquet(manifest["table"]))
     categories_bronze = (
-        pd.DataFrame(categories)
-        .drop_duplicates()
-        .assign(hierarchy_len=lambda x: x["category_hierarchy"].str.count(" > ") + 1)
+        pd.concat(frames, ignore_index=True).drop_duplicates().reset_index(drop=True)
+        if frames
+        else pd.DataFrame(columns=CATEGORIES_COLUMNS)
     )
-    categories_bronze = pd.concat(
-        [
-            categories_bronze,
-            categories_bronze["category_hierarchy"]
-            .str.split(
-                " > ",
-                expand=True,
-            )
-            .rename(
-                columns={
-                    0: "category_hierarchy_0",
-                    1: "category_hierarchy_1",
-                    2: "category_hierarchy_2",
-                    3: "category_hierarchy_3",
-                    4: "category_hierarchy_4",
-                }
-            ),
-        ],
-        axis=1,
-    ).fillna(
-        {
-            "category_hierarchy_0": "--",
-            "category_hierarchy_1": "--",
-            "category_hierarchy_2": "--",
-            "category_hierarchy_3": "--",
-            "category_hierarchy_4": "--",
-        },
+    tree = CategoryTree.merge(trees) if trees else CategoryTree.from_categories([])
+    # the table and tree are written before the manifest that points to them, so a failed run leaves the previous one valid
+    table_path = f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_CATEGORIES_CACHE_PATH}/{raw_hash}.parquet"
+    tree_path = f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_CATEGORIES_CACHE_PATH}/{raw_hash}.tree.parquet"
+    wr.s3.to_parquet(categories_bronze, path=table_path, index=False)
+    tree.save(tree_path)
+    tree.save()
+    save_json_to_s3(
+        S3_BUCKET_DATA,
+        S3_BUCKET_BRONZE_CATEGORIES_MANIFEST_PATH,
+        {"hash": raw_hash, "files": raw_files, "table": table_path, "tree": tree_path},
     )
     return categories_bronze
 
 
-def products(day: datetime.datetime) -> pd.DataFrame:
+def _list_raw_products_files(day: datetime.datetime) -> List[Dict]:
+    paginator = S3_CLIENT.get_paginator("list_objects_v2")
+    prefix = S3_BUCKET_RAW_PRODUCTS_CATEGORY_PATH.format(
+        day=day.date().strftime("%Y-%m-%d")
+    )
+    return [
+        obj
+        for page in paginator.paginate(Bucket=S3_BUCKET_DATA, Prefix=prefix + "/")
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith((".json", ".ndjson.gz", ".ndjson.zst"))
+    ]
+
+
+def _read_raw_products_file(key: str, use_threads: bool = True) -> pa.Table:
+    with open_s3_object(S3_BUCKET_DATA, key) as stream:
+        data = stream.read()
+    return _parse_raw_products(
+        data, legacy=key.endswith(".json"), use_threads=use_threads
+    )
+
+
+def _parse_raw_products(
+    data: bytes, legacy: bool, use_threads: bool = True
+) -> pa.Table:
+    if not data.strip():
+        # arrow cannot read an empty JSON file, e.g. a category without products
+        return RAW_PRODUCTS_LINE_SCHEMA.empty_table()
+    if legacy:
+        # a single document with the list of search objects of the category, written in a single line
+        document = pa_json.read_json(
+            pa.BufferReader(data),
+            read_options=pa_json.ReadOptions(
+                use_threads=use_threads, block_size=len(data) + 1
+            ),
+            parse_options=pa_json.ParseOptions(
+                explicit_schema=RAW_PRODUCTS_DOCUMENT_SCHEMA,
+                unexpected_field_behavior="ignore",
+            ),
+        ).combine_chunks()
+        search_objects = pc.list_flatten(document["search_objects"])
+        return pa.table(
+            {
+                "date": pa.repeat(document["date"][0], len(search_objects)),
+                "search_objects": search_objects,
+            }
+        )
+    # one {"date": ..., "search_objects": {...}} record per line
+    return pa_json.read_json(
+        pa.BufferReader(data),
+        read_options=pa_json.ReadOptions(use_threads=use_threads),
+        parse_options=pa_json.ParseOptions(
+            explicit_schema=RAW_PRODUCTS_LINE_SCHEMA,
+            unexpected_field_behavior="ignore",
+        ),
+    )
+
+
+def _split_unchanged(raw: pa.Table) -> Tuple[pa.Table, pa.ChunkedArray]:
+    # flattens the full search objects and returns the ids of the slim "unchanged" ones apart
+    unchanged = pc.fill_null(
+        pc.struct_field(raw["search_objects"], [_UNCHANGED_FIELD_INDEX]), False
+    )
+    if not pc.any(unchanged).as_py():
+        return _flatten_products(raw), pa.chunked_array([], pa.string())
+    unchanged_ids = pc.struct_field(
+        raw.filter(unchanged)["search_objects"], [_ID_FIELD_INDEX]
+    )
+    return _flatten_products(raw.filter(pc.invert(unchanged))), unchanged_ids
+
+
+def _process_raw_products_file(key: str) -> Tuple[pa.Table, pa.ChunkedArray]:
+    # runs in the worker processes, only Arrow tables travel back to the parent
+    return _split_unchanged(_read_raw_products_file(key, use_threads=False))
+
+
+def _raw_products_executor(workers: int) -> concurrent.futures.Executor:
+    if workers <= 1:
+        return concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    # spawned workers import their own boto3 client instead of inheriting the parent's
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _process_raw_products_files(
+    executor: concurrent.futures.Executor, keys: List[str]
+) -> Tuple[pa.Table, pa.ChunkedArray]:
+    if not keys:
+        return BRONZE_PRODUCTS_SCHEMA.empty_table(), pa.chunked_array([], pa.string())
+    results = list(executor.map(_process_raw_products_file, keys))
+    return (
+        pa.concat_tables([flattened for flattened, _ in results]),
+        pa.chunked_array(
+            [chunk for _, unchanged_ids in results for chunk in unchanged_ids.chunks],
+            pa.string(),
+        ),
+    )
+
+
+def _batch_raw_products_files(
+    raw_files: List[Dict], batch_bytes: int
+) -> Iterator[List[str]]:
+    batch, size = [], 0
+    for obj in raw_files:
+        if batch and size + obj["Size"] > batch_bytes:
+            yield batch
+            batch, size = [], 0
+        batch.append(obj["Key"])
+        size += obj["Size"]
+    if batch:
+        yield batch
+
+
+def products_table(day: datetime.datetime, workers: int = BRONZE_WORKERS) -> pa.Table:
+    """
+    Reads the raw products of a day straight into a typed Arrow table with the BRONZE_PRODUCTS_SCHEMA schema.
+
+    Raw category files can be either a single JSON document or gzip/zstd compressed NDJSON, as written by the
+    raw products Lambda. Both are parsed by the Arrow JSON reader with an explicit schema of the search object
+    fields we keep, so no Python object is created per product. Products stored as slim "unchanged" records by
+    the incremental raw ingestion are rebuilt from the previous day's bronze partition, so the result is always
+    the full snapshot of the day.
+
+    Every raw file is downloaded, parsed and flattened in a pool of `workers` processes, so the build scales with
+    the cores available.
+
+    Args:
+        day (datetime.datetime): The day for which the data is being processed.
+        workers (int): The number of worker processes, 1 to run in the calling process. Defaults to BRONZE_WORKERS.
+
+    Returns:
+        pa.Table: The bronze products of the day.
+    """
+    with _raw_products_executor(workers) as executor:
+        flattened, unchanged_ids = _process_raw_products_files(
+            executor, [obj["Key"] for obj in _list_raw_products_files(day)]
+        )
+    if not len(unchanged_ids):
+        return flattened
+    returned = pa.concat_tables(
+        [flattened, *_iter_unchanged_products(day, unchanged_ids)]
+    )
+    return returned
+
+
+def products(day: datetime.datetime, workers: int = BRONZE_WORKERS) -> pd.DataFrame:
     """
     Reads JSON data from an S3 bucket and processes it to extract relevant information.
     The data is then written to a Parquet file in the S3 bucket.
 
+    See `products_table`, this is the same table converted to pandas.
+
+    Args:
+        day (datetime.datetime): The day for which the data is being processed.
+        workers (int): The number of worker processes, 1 to run in the calling process. Defaults to BRONZE_WORKERS.
+
+    Returns:
+        pd.DataFrame: The bronze products of the day.
+    """
+    return products_table(day, workers=workers).to_pandas()
+
+
+def write_products(
+    day: datetime.datetime,
+    batch_bytes: int = BRONZE_BATCH_BYTES,
+    workers: int = BRONZE_WORKERS,
+    layout: Optional[ParquetLayout] = None,
+) -> int:
+    """
+    Builds the bronze products of a day like `products_table`, streaming them into the day's partition of the
+    bronze products dataset instead of holding the whole day in memory.
+
+    The raw files are processed in batches of at most `batch_bytes` stored (compressed) bytes, and every batch is
+    appended to the partition's Parquet file as it is flattened, so the memory used depends on `batch_bytes`
+    and not on how many categories or products were downloaded. Unchanged products are appended at the end,
+    reading the previous day's bronze partition in chunks. The partition is replaced, as with the
+    `overwrite_partitions` mode of `wr.s3.to_parquet`.
+
+    Every batch is sorted and written with `layout`. Raw files hold a single category each, so the row groups of a
+    batch cover few categories even though the partition as a whole is not sorted.
+
     Args:
         day (datetime.datetime): The day for which the data is being processed.
+        batch_bytes (int): The stored bytes of the raw files processed at once. Defaults to BRONZE_BATCH_BYTES.
+        workers (int): The number of worker processes, 1 to run in the calling process. Defaults to BRONZE_WORKERS.
+        layout (ParquetLayout, optional): The layout of the Parquet file. Defaults to ParquetLayout().
 
     Returns:
-        None
+        int: The number of products written.
+    """
+    date = day.date().strftime("%Y-%m-%d")
+    raw_files = _list_raw_products_files(day)
+    if not raw_files:
+        print(f"No raw products for {date}, the bronze partition is left as is")
+        return 0
+    unchanged_chunks = []
+    with _raw_products_executor(workers) as executor, S3PartitionWriter(
+        S3_BUCKET_BRONZE_PRODUCTS_PATH, {"date": date}, BRONZE_PRODUCTS_SCHEMA, layout
+    ) as writer:
+        for keys in _batch_raw_products_files(raw_files, batch_bytes):
+            flattened, batch_unchanged_ids = _process_raw_products_files(executor, keys)
+            writer.write(flattened)
+            unchanged_chunks.extend(batch_unchanged_ids.chunks)
+            print(
+                f"Written {writer.rows} bronze products of {date} ({len(keys)} files)"
+            )
+        unchanged_ids = pa.chunked_array(unchanged_chunks, pa.string())
+        if len(unchanged_ids):
+            for rebuilt in _iter_unchanged_products(day, unchanged_ids):
+                writer.write(rebuilt)
+        rows = writer.rows
+    return rows
+
+
+def _parse_created_at(creation_dates: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    Parses the ISO 8601 creation dates of the products into UTC timestamps in milliseconds, value by value, so an
+    odd listing does not fail the day nor the values around it.
+
+    Every value is read with its zone offset if it has one. Otherwise its date and time are taken as UTC, or its
+    date alone, and what cannot be read at all is left empty and counted. Fractions of a second of any precision
+    are truncated to the millisecond.
     """
-    df = wr.s3.read_json(
-        path=f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_RAW_PRODUCTS_CATEGORY_PATH.format(day=day.date().strftime('%Y-%m-%d'))}/"
+    # strptime has no directive for fractions of a second, so they are read apart
+    seconds = pc.replace_substring_regex(creation_dates, r"\.\d+", "")
+    fraction = pc.struct_field(
+        pc.extract_regex(creation_dates, r"\.(?P<fraction>\d+)"), [0]
     )
-    df = df.assign(
-        date=lambda x: x["date"].apply(lambda x: x.date()),
-        product_id=lambda x: x["search_objects"].apply(lambda x: x["id"]),
-        category_id=lambda x: x["search_objects"].apply(lambda x: x["category_id"]),
-        created_at=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["creation_date"]
-            if "content" in x
-            else x["creation_date"]
-        ),
-        price=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["price"] if "content" in x else x["price"]
-        ),
-        currency=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["currency"] if "content" in x else x["currency"]
-        ),
-        title=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["title"] if "content" in x else x["title"]
-        ),
-        description=lambda x: x["search_objects"].apply(
-            lambda x: x["content"].get("description", x["content"].get("storytelling"))
-            if "content" in x
-            else x.get("description", x.get("storytelling"))
-        ),
-        web_slug=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["web_slug"] if "content" in x else x["web_slug"]
-        ),
-        country_code=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["location"]["country_code"]
-            if "content" in x
-            else x["location"]["country_code"]
-        ),
-        city=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["location"]["city"]
-            if "content" in x
-            else x["location"]["city"]
-        ),
-        postal_code=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["location"]["postal_code"]
-            if "content" in x
-            else x["location"]["postal_code"]
-        ),
-        user_id=lambda x: x["search_objects"].apply(
-            lambda x: x["content"]["user"]["id"] if "content" in x else x["user"]["id"]
+    milliseconds = pc.fill_null(
+        pc.cast(
+            pc.utf8_rpad(pc.utf8_slice_codeunits(fraction, 0, 3), 3, "0"), pa.int64()
         ),
-    ).loc[
-        :,
-        [
-            "date",
-            "product_id",
-            "category_id",
-            "user_id",
-            "created_at",
-            "price",
-            "currency",
-            "title",
-            "description",
-            "web_slug",
-            "country_code",
-            "city",
-            "postal_code",
-        ],
-    ]
-    return df
+        0,
+    )
+    utc = pa.timestamp("ms", tz="UTC")
+    created_at = pc.coalesce(
+        pc.strptime(
+            seconds, format="%Y-%m-%dT%H:%M:%S%z", unit="ms", error_is_null=True
+        ).cast(utc),
+        pc.strptime(
+            pc.utf8_slice_codeunits(seconds, 0, 19),
+            format="%Y-%m-%dT%H:%M:%S",
+            unit="ms",
+            error_is_null=True,
+        ).cast(utc),
+        pc.strptime(
+            pc.utf8_slice_codeunits(seconds, 0, 10),
+            format="%Y-%m-%d",
+            unit="ms",
+            error_is_null=True,
+        ).cast(utc),
+    )
+    created_at = pc.add(created_at, pc.cast(milliseconds, pa.duration("ms")))
+    invalid = len(creation_dates) - creation_dates.null_count
+    invalid -= len(created_at) - created_at.null_count
+    if invalid:
+        print(f"{invalid} creation dates could not be parsed and are left empty")
+    return created_at
+
+
+def _flatten_products(raw: pa.Table) -> pa.Table:
+    flat = raw
+    while any(pa.types.is_struct(field.type) for field in flat.schema):
+        flat = flat.flatten()
+
+    def _field(path: str) -> pa.ChunkedArray:
+        # search objects come either with their fields nested in "content" or flat
+        return pc.coalesce(
+            flat[f"search_objects.content.{path}"], flat[f"search_objects.{path}"]
+        )
+
+    flattened = pa.table(
+        {
+            "date": pc.cast(flat["date"], pa.date32()),
+            "product_id": flat["search_objects.id"],
+            "category_id": flat["search_objects.category_id"],
+            "user_id": _field("user.id"),
+            "created_at": _parse_created_at(_field("creation_date")),
+            "price": _field("price"),
+            "currency": _field("currency"),
+            "title": _field("title"),
+            "description": pc.coalesce(
+                flat["search_objects.content.description"],
+                flat["search_objects.content.storytelling"],
+                flat["search_objects.description"],
+                flat["search_objects.storytelling"],
+            ),
+            "web_slug": _field("web_slug"),
+            "country_code": _field("location.country_code"),
+            "city": _field("location.city"),
+            "postal_code": _field("location.postal_code"),
+        }
+    ).cast(BRONZE_PRODUCTS_SCHEMA)
+    return flattened
+
+
+def _iter_unchanged_products(
+    day: datetime.datetime, product_ids: pa.ChunkedArray
+) -> Iterator[pa.Table]:
+    # unchanged products were seen the day before, so their full row is in that bronze partition
+    previous_day = (day.date() - datetime.timedelta(1)).strftime("%Y-%m-%d")
+    pending = set(pc.unique(product_ids).to_pylist())
+    expected = len(pending)
+    try:
+        for products_bronze in wr.s3.read_parquet(
+            f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_PRODUCTS_PATH}",
+            dataset=True,
+            partition_filter=lambda x: x["date"] == previous_day,
+            chunked=True,
+        ):
+            rebuilt = (
+                products_bronze.loc[products_bronze["product_id"].isin(pending)]
+                .drop_duplicates("product_id")
+                .assign(date=day.date())
+                .loc[:, PRODUCTS_COLUMNS]
+            )
+            pending.difference_update(rebuilt["product_id"])
+            # cast, as partitions written before the typed schema have string timestamps
+            yield pa.Table.from_pandas(rebuilt, preserve_index=False).cast(
+                BRONZE_PRODUCTS_SCHEMA
+            )
+            if not pending:
+                break
+    except wr.exceptions.NoFilesFound:
+        print(
+            f"No bronze products of {previous_day} to rebuild unchanged products from"
+        )
+    if pending:
+        print(
+            f"{len(pending)} of {expected} unchanged products of {day.date()} are not in the bronze products of {previous_day}"
+        )
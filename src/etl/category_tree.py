@@ -0,0 +1,235 @@
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+import awswrangler as wr
+from .utils import S3_BUCKET_BRONZE_CATEGORY_TREE_PATH, S3_BUCKET_DATA
+
+TREE_COLUMNS = ["category_id", "parent_id", "name", "vertical_id"]
+
+
+class CategoryTree:
+    """
+    Compiled Wallapop category tree, shared by the bronze, silver and gold layers.
+
+    Every category of the tree is a node with an integer position, numbered in preorder so the descendants of
+    a node are the contiguous positions `[node, subtree_end[node])`. The tree keeps, as arrays indexed by node:
+    the category ID, the parent node (-1 for roots), the depth, the root node, the name, the full " > " joined
+    hierarchy and an `ancestors` matrix whose column `d` is the ancestor at depth `d` (-1 past the node's depth).
+    Lookups of whole columns of category IDs are then a `searchsorted` plus array indexing, with no string
+    manipulation nor Python loops per row. Unknown category IDs map to node -1.
+
+    The tree is persisted in S3 as a small Parquet file with one row per category (`TREE_COLUMNS`) and compiled
+    again on load.
+
+    Args:
+        nodes (pd.DataFrame): The categories of the tree with the `TREE_COLUMNS` columns. `parent_id` is -1 or
+            null for roots, and so are parents that are not in the frame.
+    """
+
+    def __init__(self, nodes: pd.DataFrame):
+        category_ids = nodes["category_id"].to_numpy(dtype="int64")
+        parent_ids = nodes["parent_id"].fillna(-1).to_numpy(dtype="int64")
+        position = {category_id: i for i, category_id in enumerate(category_ids)}
+        parent_position = np.full(len(category_ids), -1, dtype="int64")
+        children: List[List[int]] = [[] for _ in category_ids]
+        roots = []
+        for i, parent_id in enumerate(parent_ids):
+            if parent_id in position and position[parent_id] != i:
+                parent_position[i] = position[parent_id]
+                children[position[parent_id]].append(i)
+            else:
+                roots.append(i)
+        # preorder numbering, iterative so deep trees do not hit the recursion limit
+        order = []
+        stack = roots[::-1]
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            stack.extend(children[i][::-1])
+        order = np.array(order, dtype="int64")
+        node = np.empty(len(order), dtype="int32")
+        node[order] = np.arange(len(order), dtype="int32")
+        self.category_id = category_ids[order]
+        self.name = nodes["name"].to_numpy(dtype=object)[order]
+        self.vertical_id = nodes["vertical_id"].to_numpy(dtype=object)[order]
+        self.parent = np.where(
+            parent_position[order] >= 0, node[parent_position[order]], -1
+        ).astype("int32")
+        n = len(self.category_id)
+        self.depth = np.zeros(n, dtype="int16")
+        self.hierarchy = np.empty(n, dtype=object)
+        for i in range(n):
+            # parents come before their children in preorder
+            parent = self.parent[i]
+            if parent < 0:
+                self.hierarchy[i] = self.name[i]
+            else:
+                self.depth[i] = self.depth[parent] + 1
+                self.hierarchy[i] = f"{self.hierarchy[parent]} > {self.name[i]}"
+        size = np.ones(n, dtype="int32")
+        for i in range(n - 1, 0, -1):
+            if self.parent[i] >= 0:
+                size[self.parent[i]] += size[i]
+        self.subtree_end = np.arange(n, dtype="int32") + size
+        self.ancestors = np.full(
+            (n, int(self.depth.max(initial=0)) + 1), -1, dtype="int32"
+        )
+        current = np.arange(n, dtype="int32")
+        valid = np.ones(n, dtype=bool)
+        while valid.any():
+            self.ancestors[valid, self.depth[current[valid]]] = current[valid]
+            current[valid] = self.parent[current[valid]]
+            valid = current >= 0
+        self.root = self.ancestors[:, 0]
+        self._sorter = np.argsort(self.category_id, kind="stable")
+        self._sorted_ids = self.category_id[self._sorter]
+
+    def __len__(self) -> int:
+        return len(self.category_id)
+
+    @classmethod
+    def from_categories(cls, categories: List[Dict]) -> "CategoryTree":
+        """
+        Compiles the tree of the `categories` list of the raw categories JSON, with nested `subcategories`.
+        """
+        nodes = []
+        stack = [(category, -1) for category in reversed(categories)]
+        while stack:
+            category, parent_id = stack.pop()
+            nodes.append(
+                (
+                    category["id"],
+                    parent_id,
+                    category["name"],
+                    category.get("vertical_id"),
+                )
+            )
+            stack.extend(
+                (subcategory, category["id"])
+                for subcategory in reversed(category.get("subcategories") or [])
+            )
+        return cls(pd.DataFrame(nodes, columns=TREE_COLUMNS))
+
+    @classmethod
+    def merge(cls, trees: List["CategoryTree"]) -> "CategoryTree":
+        """
+        Compiles the union of the given trees. Categories in several trees keep their last version.
+        """
+        return cls(
+            pd.concat([tree.to_frame() for tree in trees], ignore_index=True)
+            .drop_duplicates("category_id", keep="last")
+            .reset_index(drop=True)
+        )
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "CategoryTree":
+        """
+        Reads a tree persisted with `save`. Defaults to the tree of the bronze layer.
+        """
+        return cls(
+            wr.s3.read_parquet(
+                path or f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_CATEGORY_TREE_PATH}",
+                columns=TREE_COLUMNS,
+            )
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "category_id": self.category_id,
+                "parent_id": np.where(
+                    self.parent >= 0, self.category_id[self.parent], -1
+                ),
+                "name": self.name,
+                "vertical_id": self.vertical_id,
+            }
+        )
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Persists the tree, by default as the tree of the bronze layer.
+        """
+        wr.s3.to_parquet(
+            self.to_frame(),
+            path=path or f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_CATEGORY_TREE_PATH}",
+            index=False,
+        )
+
+    def nodes(self, category_ids) -> np.ndarray:
+        """
+        Returns the node of every category ID, -1 for unknown IDs.
+        """
+        category_ids = np.asarray(category_ids, dtype="int64")
+        if not len(self):
+            return np.full(category_ids.shape, -1, dtype="int32")
+        positions = np.searchsorted(self._sorted_ids, category_ids).clip(
+            max=len(self) - 1
+        )
+        return np.where(
+            self._sorted_ids[positions] == category_ids, self._sorter[positions], -1
+        ).astype("int32")
+
+    def _take(self, values: np.ndarray, nodes: np.ndarray, missing) -> np.ndarray:
+        if not len(values):
+            # every category ID is unknown to an empty tree
+            return np.full(
+                nodes.shape, missing, dtype=object if missing is None else values.dtype
+            )
+        returned = values[nodes]
+        if (nodes < 0).any():
+            returned = returned.astype(object) if missing is None else returned
+            returned[nodes < 0] = missing
+        return returned
+
+    def root_of(self, category_ids) -> np.ndarray:
+        """
+        Returns the category ID of the root of every category ID, -1 for unknown IDs.
+        """
+        nodes = self.nodes(category_ids)
+        return self._take(self.category_id[self.root], nodes, -1)
+
+    def ancestors_of(self, category_ids) -> np.ndarray:
+        """
+        Returns a matrix with a row per category ID whose column `d` is the category ID of its ancestor at depth
+        `d`, the category itself at its own depth and -1 past it or for unknown IDs.
+        """
+        nodes = self.nodes(category_ids)
+        if not len(self):
+            return np.full(nodes.shape + (1,), -1, dtype="int64")
+        ancestors = self.ancestors[nodes]
+        ancestors[nodes < 0] = -1
+        return np.where(ancestors >= 0, self.category_id[ancestors], -1)
+
+    def descendants_of(self, category_id: int) -> np.ndarray:
+        """
+        Returns the category IDs of the subtree of `category_id`, itself included.
+        """
+        node = self.nodes([category_id])[0]
+        if node < 0:
+            return np.empty(0, dtype="int64")
+        return self.category_id[node : self.subtree_end[node]]
+
+    def is_descendant_of(self, category_ids, ancestor_id: int) -> np.ndarray:
+        """
+        Returns whether every category ID is in the subtree of `ancestor_id`.
+        """
+        nodes = self.nodes(category_ids)
+        ancestor = self.nodes([ancestor_id])[0]
+        if ancestor < 0:
+            return np.zeros(nodes.shape, dtype=bool)
+        return (nodes >= ancestor) & (nodes < self.subtree_end[ancestor])
+
+    def depth_of(self, category_ids) -> np.ndarray:
+        return self._take(self.depth, self.nodes(category_ids), -1)
+
+    def name_of(self, category_ids) -> np.ndarray:
+        return self._take(self.name, self.nodes(category_ids), None)
+
+    def hierarchy_of(self, category_ids) -> np.ndarray:
+        return self._take(self.hierarchy, self.nodes(category_ids), None)
+
+    def leaves(self) -> np.ndarray:
+        """
+        Returns the nodes without subcategories.
+        """
+        return np.flatnonzero(self.subtree_end == np.arange(len(self)) + 1)
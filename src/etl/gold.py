@@ -1,37 +1,224 @@
+import concurrent.futures
 import datetime
+import numpy as np
 import pandas as pd
-from .utils import GOLD_TIMEFRAME_LIMIT, S3_BUCKET_DATA, S3_BUCKET_SILVER_PRODUCTS_PATH
-from typing import List
+import pyarrow as pa
+from .category_tree import CategoryTree
+from .grouping_sets import aggregate_grouping_sets
+from .parquet_layout import ParquetLayout, S3PartitionWriter
+from .utils import (
+    BACKFILL_WORKERS,
+    GOLD_PARTITION_WORKERS,
+    GOLD_TIMEFRAME_LIMIT,
+    S3_BUCKET_DATA,
+    S3_BUCKET_GOLD_CATEGORIES_DAILY_PATH,
+    S3_BUCKET_GOLD_CATEGORIES_PATH,
+    S3_BUCKET_GOLD_LOCATIONS_DAILY_PATH,
+    S3_BUCKET_GOLD_LOCATIONS_PATH,
+    S3_BUCKET_GOLD_PRODUCTS_DAILY_PATH,
+    S3_BUCKET_GOLD_PRODUCTS_PATH,
+    S3_BUCKET_SILVER_PRODUCTS_PATH,
+    S3_CLIENT,
+)
+from typing import Dict, List, Optional, Tuple
 import awswrangler as wr
 
+GOLD_CATEGORIES_COLUMNS = [
+    "date",
+    "category_id",
+    "price",
+    "product_id",
+    "days_since_creation",
+]
+GOLD_LOCATIONS_COLUMNS = [
+    "date",
+    "country_code",
+    "city",
+    "postal_code",
+    "price",
+    "product_id",
+    "days_since_creation",
+]
+GOLD_PRODUCTS_COLUMNS = [
+    "date",
+    "title",
+    "web_slug",
+    "price",
+    "product_id",
+    "days_since_creation",
+]
+# the metrics of the gold categories and locations, by output column
+GOLD_AGGREGATIONS = {
+    "price_mean": ("price", "mean"),
+    "price_max": ("price", "max"),
+    "price_min": ("price", "min"),
+    "product_id": ("product_id", "count"),
+    "days_since_creation": ("days_since_creation", "mean"),
+}
+# the daily dataset and the silver columns of every published gold table
+GOLD_TABLES = {
+    S3_BUCKET_GOLD_CATEGORIES_PATH: (
+        S3_BUCKET_GOLD_CATEGORIES_DAILY_PATH,
+        GOLD_CATEGORIES_COLUMNS,
+    ),
+    S3_BUCKET_GOLD_LOCATIONS_PATH: (
+        S3_BUCKET_GOLD_LOCATIONS_DAILY_PATH,
+        GOLD_LOCATIONS_COLUMNS,
+    ),
+    S3_BUCKET_GOLD_PRODUCTS_PATH: (
+        S3_BUCKET_GOLD_PRODUCTS_DAILY_PATH,
+        GOLD_PRODUCTS_COLUMNS,
+    ),
+}
 
-def _download_products_silver(
-    day: datetime.datetime, columns: List[str]
-) -> pd.DataFrame:
-    def _limit_gold_timeframe(
-        day: datetime.datetime, n: int = GOLD_TIMEFRAME_LIMIT
-    ) -> List[str]:
-        end = day.date()
-        returned = [
-            (end - datetime.timedelta(i)).strftime("%Y-%m-%d") for i in range(n)
-        ]
-        return returned
-
-    products_silver = wr.s3.read_parquet(
-        f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_SILVER_PRODUCTS_PATH}/",
+
+# the layout of the daily partitions of every published gold table, sorted by their grouping keys as the
+# default layout sorts by product_id, the product count of the aggregates. Products are written in silver order.
+GOLD_LAYOUTS = {
+    S3_BUCKET_GOLD_CATEGORIES_PATH: ParquetLayout(
+        sort_by=["category_display_name", "category_parent_display_name"],
+        bloom_filter_columns=[],
+    ),
+    S3_BUCKET_GOLD_LOCATIONS_PATH: ParquetLayout(
+        sort_by=["city_display_name", "postal_code", "location_display_name"],
+        bloom_filter_columns=[],
+    ),
+    S3_BUCKET_GOLD_PRODUCTS_PATH: ParquetLayout(sort_by=[], bloom_filter_columns=[]),
+}
+
+
+def _gold_timeframe(
+    day: datetime.datetime, start: Optional[datetime.datetime] = None
+) -> List[str]:
+    # the window ends on `day` and covers GOLD_TIMEFRAME_LIMIT days, or from `start` if given
+    n = (day.date() - start.date()).days + 1 if start else GOLD_TIMEFRAME_LIMIT
+    end = day.date()
+    returned = [(end - datetime.timedelta(i)).strftime("%Y-%m-%d") for i in range(n)]
+    return returned[::-1]
+
+
+def _list_partition(dataset_key: str, date: str) -> List[str]:
+    paginator = S3_CLIENT.get_paginator("list_objects_v2")
+    prefix = f"{dataset_key}/date={date}/"
+    return [
+        f"s3://{S3_BUCKET_DATA}/{obj['Key']}"
+        for page in paginator.paginate(Bucket=S3_BUCKET_DATA, Prefix=prefix)
+        for obj in page.get("Contents", [])
+        if obj["Key"].endswith(".parquet")
+    ]
+
+
+def _latest_partition(dataset_key: str) -> Optional[str]:
+    # the date of the latest partition of a dataset, listing only its `date=` prefixes
+    paginator = S3_CLIENT.get_paginator("list_objects_v2")
+    dates = [
+        prefix["Prefix"].rstrip("/").split("=", 1)[1]
+        for page in paginator.paginate(
+            Bucket=S3_BUCKET_DATA, Prefix=f"{dataset_key}/date=", Delimiter="/"
+        )
+        for prefix in page.get("CommonPrefixes", [])
+    ]
+    return max(dates, default=None)
+
+
+def _resolve_partitions(dataset_key: str, dates: List[str]) -> Dict[str, List[str]]:
+    """
+    Resolves the files of the partitions of the given dates of a dataset, listing only their exact
+    `date=YYYY-MM-DD/` prefixes in parallel instead of the whole dataset. The dates without files are left out
+    with a warning.
+
+    Args:
+        dataset_key (str): The key of the dataset in S3_BUCKET_DATA, e.g. S3_BUCKET_SILVER_PRODUCTS_PATH.
+        dates (list): The dates in ISO format.
+
+    Returns:
+        dict: The paths of the files of every partition found, by date.
+    """
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=GOLD_PARTITION_WORKERS
+    ) as executor:
+        files = dict(
+            zip(dates, executor.map(lambda x: _list_partition(dataset_key, x), dates))
+        )
+    missing = [date for date, paths in files.items() if not paths]
+    if missing:
+        print(
+            f"Warning: {len(missing)} of {len(dates)} days of {dataset_key} are missing: {', '.join(missing)}"
+        )
+    return {date: paths for date, paths in files.items() if paths}
+
+
+def _read_partitions(
+    dataset_key: str, dates: List[str], columns: Optional[List[str]] = None
+) -> Optional[pd.DataFrame]:
+    # the partitions of the dates found, with the date partition column, or None if there are none
+    partitions = _resolve_partitions(dataset_key, dates)
+    if not partitions:
+        return None
+    return wr.s3.read_parquet(
+        [path for paths in partitions.values() for path in paths],
         dataset=True,
-        partition_filter=lambda x: (x["date"] in _limit_gold_timeframe(day)),
+        path_root=f"s3://{S3_BUCKET_DATA}/{dataset_key}/",
         columns=columns,
     )
+
+
+def _download_products_silver(
+    day: datetime.datetime,
+    columns: List[str],
+    start: Optional[datetime.datetime] = None,
+) -> pd.DataFrame:
+    products_silver = _read_partitions(
+        S3_BUCKET_SILVER_PRODUCTS_PATH, _gold_timeframe(day, start), columns
+    )
+    if products_silver is None:
+        return pd.DataFrame(columns=columns)
     return products_silver
 
 
-def gold_category_and_total(day: datetime.datetime) -> pd.DataFrame:
+def _distinct_keys(
+    df: pd.DataFrame, keys: List[str]
+) -> Tuple[np.ndarray, pd.DataFrame]:
+    # the code of the distinct key of every row, and the distinct keys in the order of their codes
+    grouped = df.groupby(keys, observed=True, sort=False, dropna=False)
+    return grouped.ngroup().to_numpy(), grouped.size().index.to_frame(index=False)
+
+
+def _key_strings(keys: pd.DataFrame) -> pd.DataFrame:
+    # the distinct keys formatted as f-strings do, missing values included
+    return keys.astype(object).apply(lambda x: x.map(str))
+
+
+def _display_names(codes: np.ndarray, names) -> pd.Categorical:
+    """
+    Attaches the display names of the distinct keys to the rows by the codes of their keys, so the names are
+    built once per distinct key instead of once per row. The categories are sorted, so grouping by the display
+    names sorts them as strings.
+
+    Args:
+        codes (np.ndarray): The code of the distinct key of every row, see `_distinct_keys`.
+        names (array-like): The display name of every distinct key, by code.
+
+    Returns:
+        pd.Categorical: The display name of every row.
+    """
+    name_codes, categories = pd.factorize(np.asarray(names, dtype=object), sort=True)
+    return pd.Categorical.from_codes(name_codes[codes], categories)
+
+
+def gold_category_and_total(
+    day: datetime.datetime,
+    products_silver: Optional[pd.DataFrame] = None,
+    category_tree: Optional[CategoryTree] = None,
+) -> pd.DataFrame:
     """
     Generate a DataFrame with the price and count evolution of categories over time.
 
     Parameters:
         day (datetime.datetime): The date for which to calculate the category evolution.
+        products_silver (pd.DataFrame, optional): The silver products of the window, with at least the
+            GOLD_CATEGORIES_COLUMNS columns. Downloaded for the GOLD_TIMEFRAME_LIMIT days up to `day` if not given.
+        category_tree (CategoryTree, optional): The category tree. Loaded if not given.
 
     Returns:
         pd.DataFrame: A DataFrame with the following columns:
@@ -40,119 +227,58 @@ def gold_category_and_total(day: datetime.datetime) -> pd.DataFrame:
             - price_mean (float): The mean price of the category.
             - price_max (float): The maximum price of the category.
             - price_min (float): The minimum price of the category.
-            - count (int): The number of products in the category.
+            - product_id (int): The number of products in the category.
+            - days_since_creation (float): The mean number of days since creation of the products in the category.
             - category_parent_display_name (str): The display name of the parent category.
 
-    The DataFrame also includes a row for the '--' category.
+    The categories are grouped with their parent, so the '--' total of every date, which has no parent, is not
+    included.
     """
-    products_silver = _download_products_silver(
-        day,
-        [
-            "date",
-            "category_name",
-            "category_hierarchy",
-            "category_id",
-            "price",
-            "product_id",
-            "days_since_creation",
-        ],
-    ).assign(
-        category_display_name=lambda x: x.apply(
-            lambda y: f"{y.category_name} ({y.category_hierarchy} - {y.category_id})",
-            axis=1,
-        )
-    )
-    price_evolution = pd.concat(
-        [
-            (
-                products_silver.groupby(
-                    [
-                        "date",
-                        "category_display_name",
-                    ],
-                    observed=True,
-                )["price"]
-                .agg(price_mean="mean", price_max="max", price_min="min")
-                .reset_index()
-            ),
-            (
-                products_silver.groupby("date", observed=True)["price"]
-                .agg(price_mean="mean", price_max="max", price_min="min")
-                .reset_index()
-                .assign(category_display_name="--")
-            ),
-        ]
-    )
-    count_evolution = pd.concat(
-        [
-            (
-                products_silver.groupby(
-                    [
-                        "date",
-                        "category_display_name",
-                    ],
-                    observed=True,
-                )["product_id"]
-                .count()
-                .reset_index()
-            ),
-            (
-                products_silver.groupby("date", observed=True)["product_id"]
-                .count()
-                .reset_index()
-                .assign(category_display_name="--")
-            ),
-        ]
-    )
-    item_duration_evolution = pd.concat(
-        [
-            (
-                products_silver.groupby(
-                    [
-                        "date",
-                        "category_display_name",
-                    ],
-                    observed=True,
-                )["days_since_creation"]
-                .mean()
-                .reset_index()
-            ),
-            (
-                products_silver.groupby("date", observed=True)["days_since_creation"]
-                .mean()
-                .reset_index()
-                .assign(category_display_name="--")
-            ),
-        ]
-    )
-    return (
-        price_evolution.merge(
-            count_evolution,
-            on=["date", "category_display_name"],
-        )
-        .merge(
-            item_duration_evolution,
-            on=["date", "category_display_name"],
-        )
-        .merge(
-            products_silver.assign(
-                category_parent_display_name=lambda x: x.category_hierarchy.apply(
-                    lambda y: y.split(" > ")[0]
+    category_tree = category_tree or CategoryTree.load()
+    if products_silver is None:
+        products_silver = _download_products_silver(day, GOLD_CATEGORIES_COLUMNS)
+    # the names and parent of every distinct category come from the category tree
+    codes, categories = _distinct_keys(products_silver, ["category_id"])
+    category_ids = categories["category_id"].to_numpy()
+    products_silver = products_silver.assign(
+        category_display_name=_display_names(
+            codes,
+            [
+                f"{name} ({hierarchy} - {category_id})"
+                for name, hierarchy, category_id in zip(
+                    category_tree.name_of(category_ids),
+                    category_tree.hierarchy_of(category_ids),
+                    category_ids,
                 )
-            )[
-                ["category_display_name", "category_parent_display_name"]
-            ].drop_duplicates(),
-            on="category_display_name",
-        )
+            ],
+        ),
+        category_parent_display_name=_display_names(
+            codes, category_tree.name_of(category_tree.root_of(category_ids))
+        ),
     )
+    returned = aggregate_grouping_sets(
+        products_silver,
+        [["date", "category_display_name", "category_parent_display_name"]],
+        GOLD_AGGREGATIONS,
+    )
+    return returned[
+        ["date", "category_display_name"]
+        + list(GOLD_AGGREGATIONS)
+        + ["category_parent_display_name"]
+    ]
 
 
-def gold_location_and_total(day: datetime.datetime) -> pd.DataFrame:
+def gold_location_and_total(
+    day: datetime.datetime,
+    products_silver: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
     """
     Retrieves the gold data for location and total data for a given day.
 
     Args:
         day (datetime.datetime): The date for which to retrieve the data.
+        products_silver (pd.DataFrame, optional): The silver products of the window, with at least the
+            GOLD_LOCATIONS_COLUMNS columns. Downloaded for the GOLD_TIMEFRAME_LIMIT days up to `day` if not given.
 
     Returns:
         pd.DataFrame: A DataFrame containing the gold location and total data. The DataFrame has the following columns:
@@ -168,117 +294,41 @@ def gold_location_and_total(day: datetime.datetime) -> pd.DataFrame:
 
     The DataFrame also includes a row for the '--' location.
     """
-    products_silver = _download_products_silver(
-        day,
-        [
-            "date",
-            "country_code",
-            "city",
-            "postal_code",
-            "price",
-            "product_id",
-            "days_since_creation",
-        ],
-    ).assign(
-        location_display_name=lambda x: x.apply(
-            lambda y: f"{y.city}, {y.country_code} ({y.postal_code})",
-            axis=1,
-        ),
-        city_display_name=lambda x: x.apply(
-            lambda y: f"{y.city}, {y.country_code}",
-            axis=1,
-        ),
+    if products_silver is None:
+        products_silver = _download_products_silver(day, GOLD_LOCATIONS_COLUMNS)
+    codes, locations = _distinct_keys(
+        products_silver, ["city", "country_code", "postal_code"]
     )
-    price_evolution = pd.concat(
-        [
-            (
-                products_silver.groupby(
-                    [
-                        "date",
-                        "city_display_name",
-                        "postal_code",
-                        "location_display_name",
-                    ],
-                    observed=True,
-                )["price"]
-                .agg(price_mean="mean", price_max="max", price_min="min")
-                .reset_index()
-            ),
-            (
-                products_silver.groupby("date", observed=True)["price"]
-                .agg(price_mean="mean", price_max="max", price_min="min")
-                .reset_index()
-                .assign(
-                    location_display_name="--", postal_code="--", city_display_name="--"
-                )
-            ),
-        ]
-    )
-    count_evolution = pd.concat(
-        [
-            (
-                products_silver.groupby(
-                    [
-                        "date",
-                        "city_display_name",
-                        "postal_code",
-                        "location_display_name",
-                    ],
-                    observed=True,
-                )["product_id"]
-                .count()
-                .reset_index()
-            ),
-            (
-                products_silver.groupby("date", observed=True)["product_id"]
-                .count()
-                .reset_index()
-                .assign(
-                    location_display_name="--", postal_code="--", city_display_name="--"
-                )
-            ),
-        ]
+    locations = _key_strings(locations)
+    city_display_names = locations["city"] + ", " + locations["country_code"]
+    products_silver = products_silver.assign(
+        location_display_name=_display_names(
+            codes, city_display_names + " (" + locations["postal_code"] + ")"
+        ),
+        city_display_name=_display_names(codes, city_display_names),
     )
-    item_duration_evolution = pd.concat(
+    returned = aggregate_grouping_sets(
+        products_silver,
         [
-            (
-                products_silver.groupby(
-                    [
-                        "date",
-                        "city_display_name",
-                        "postal_code",
-                        "location_display_name",
-                    ],
-                    observed=True,
-                )["days_since_creation"]
-                .mean()
-                .reset_index()
-            ),
-            (
-                products_silver.groupby("date", observed=True)["days_since_creation"]
-                .mean()
-                .reset_index()
-                .assign(
-                    location_display_name="--", postal_code="--", city_display_name="--"
-                )
-            ),
-        ]
-    )
-    return price_evolution.merge(
-        count_evolution,
-        on=["date", "location_display_name", "city_display_name", "postal_code"],
-    ).merge(
-        item_duration_evolution,
-        on=["date", "location_display_name", "city_display_name", "postal_code"],
+            ["date", "city_display_name", "postal_code", "location_display_name"],
+            ["date"],
+        ],
+        GOLD_AGGREGATIONS,
     )
+    return returned
 
 
-def gold_product(day: datetime.datetime) -> pd.DataFrame:
+def gold_product(
+    day: datetime.datetime,
+    products_silver: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
     """
     Retrieves the product information for a specific day from the `products_silver` DataFrame.
 
     Args:
         day (datetime.datetime): The date for which the product information is requested.
+        products_silver (pd.DataFrame, optional): The silver products of the window, with at least the
+            GOLD_PRODUCTS_COLUMNS columns. Downloaded for the GOLD_TIMEFRAME_LIMIT days up to `day` if not given.
 
     Returns:
         pd.DataFrame: A DataFrame containing the following columns:
@@ -288,23 +338,223 @@ def gold_product(day: datetime.datetime) -> pd.DataFrame:
             - price (float): The price of the product.
             - days_since_creation (int): The number of days since the product was created.
     """
-    products_silver = _download_products_silver(
-        day,
-        [
-            "date",
-            "title",
-            "web_slug",
-            "price",
-            "product_id",
-            "days_since_creation",
-        ],
-    ).assign(
-        product_display_name=lambda x: x.apply(
-            lambda y: f"{y.title} ({y.product_id})",
-            axis=1,
+    if products_silver is None:
+        products_silver = _download_products_silver(day, GOLD_PRODUCTS_COLUMNS)
+    # keyed by title too, as sellers can edit it
+    codes, products = _distinct_keys(products_silver, ["title", "product_id"])
+    products = _key_strings(products)
+    products_silver = products_silver.assign(
+        product_display_name=_display_names(
+            codes, products["title"] + " (" + products["product_id"] + ")"
         )
     )
     returned = products_silver[
         ["date", "product_display_name", "web_slug", "price", "days_since_creation"]
     ]
     return returned
+
+
+def _build_gold(
+    key: str,
+    day: datetime.datetime,
+    products_silver: pd.DataFrame,
+    category_tree: Optional[CategoryTree],
+) -> pd.DataFrame:
+    builders = {
+        S3_BUCKET_GOLD_CATEGORIES_PATH: lambda: gold_category_and_total(
+            day, products_silver, category_tree
+        ),
+        S3_BUCKET_GOLD_LOCATIONS_PATH: lambda: gold_location_and_total(
+            day, products_silver
+        ),
+        S3_BUCKET_GOLD_PRODUCTS_PATH: lambda: gold_product(day, products_silver),
+    }
+    return builders[key]()
+
+
+def write_daily(
+    day: datetime.datetime,
+    tables: List[str] = list(GOLD_TABLES),
+    category_tree: Optional[CategoryTree] = None,
+) -> Dict[str, int]:
+    """
+    Aggregates the silver products of a single day into the gold tables and writes them to the partition of the
+    day of their daily datasets, replacing it. Every gold table groups by date, so the rows of a day only depend
+    on the silver products of that day and are built once, when they land, instead of on every publication of
+    the window.
+
+    Args:
+        day (datetime.datetime): The day to aggregate.
+        tables (list): The keys of the published gold tables to build, from GOLD_TABLES. Defaults to all of them.
+        category_tree (CategoryTree, optional): The category tree, to share it among days. Loaded if needed and
+            not given.
+
+    Returns:
+        dict: The rows written by table, empty if the silver products of the day are missing.
+    """
+    date = day.date().strftime("%Y-%m-%d")
+    products_silver = _download_products_silver(
+        day,
+        list(dict.fromkeys(column for key in tables for column in GOLD_TABLES[key][1])),
+        start=day,
+    )
+    if products_silver.empty:
+        print(f"No silver products on {date}, the gold partitions are not written")
+        return {}
+    if S3_BUCKET_GOLD_CATEGORIES_PATH in tables:
+        category_tree = category_tree or CategoryTree.load()
+    rows = {}
+    for key in tables:
+        table = pa.Table.from_pandas(
+            _build_gold(key, day, products_silver, category_tree),
+            preserve_index=False,
+        )
+        with S3PartitionWriter(
+            GOLD_TABLES[key][0], {"date": date}, table.schema, GOLD_LAYOUTS[key]
+        ) as writer:
+            writer.write(table)
+        rows[key] = writer.rows
+    return rows
+
+
+def publish(
+    day: datetime.datetime,
+    tables: List[str] = list(GOLD_TABLES),
+    start: Optional[datetime.datetime] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Assembles the window of the gold tables by concatenating the daily partitions of its days and writes them
+    to S3 as CSV. See `write_daily`.
+
+    Args:
+        day (datetime.datetime): The last day of the window.
+        tables (list): The keys of the published gold tables, from GOLD_TABLES. Defaults to all of them.
+        start (datetime.datetime, optional): The first day of the window. Defaults to the GOLD_TIMEFRAME_LIMIT
+            days up to `day`.
+
+    Returns:
+        dict: The gold tables written, by their key in S3.
+    """
+    gold = {}
+    for key in tables:
+        df = _read_partitions(GOLD_TABLES[key][0], _gold_timeframe(day, start))
+        if df is None:
+            print(f"No daily partitions of {key} in the window, it is not written")
+            continue
+        gold[key] = df[["date"] + [column for column in df.columns if column != "date"]]
+        wr.s3.to_csv(df=gold[key], path=f"s3://{S3_BUCKET_DATA}/{key}", index=False)
+    return gold
+
+
+def _seed_daily(
+    day: datetime.datetime,
+    tables: List[str] = list(GOLD_TABLES),
+    workers: int = BACKFILL_WORKERS,
+) -> None:
+    """
+    Writes the daily partitions of the window before `day` that are missing while the silver products of their
+    day exist, e.g. on the first run or after a failed day, so the published window is not truncated.
+
+    Args:
+        day (datetime.datetime): The last day of the window, which is not seeded.
+        tables (list): The keys of the published gold tables, from GOLD_TABLES. Defaults to all of them.
+        workers (int): The days aggregated at the same time. Defaults to BACKFILL_WORKERS.
+    """
+    pairs = [(key, date) for key in tables for date in _gold_timeframe(day)[:-1]]
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=GOLD_PARTITION_WORKERS
+    ) as executor:
+        listed = executor.map(
+            lambda x: _list_partition(GOLD_TABLES[x[0]][0], x[1]), pairs
+        )
+        missing = {}
+        for (key, date), paths in zip(pairs, listed):
+            if not paths:
+                missing.setdefault(date, []).append(key)
+    if not missing:
+        return
+    dates = list(_resolve_partitions(S3_BUCKET_SILVER_PRODUCTS_PATH, sorted(missing)))
+    if not dates:
+        return
+    print(f"Seeding the missing daily gold partitions of {len(dates)} days")
+    category_tree = (
+        CategoryTree.load()
+        if any(S3_BUCKET_GOLD_CATEGORIES_PATH in missing[date] for date in dates)
+        else None
+    )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        list(
+            executor.map(
+                lambda date: write_daily(
+                    datetime.datetime.fromisoformat(date),
+                    missing[date],
+                    category_tree=category_tree,
+                ),
+                dates,
+            )
+        )
+
+
+def update(
+    day: datetime.datetime, tables: List[str] = list(GOLD_TABLES)
+) -> Dict[str, pd.DataFrame]:
+    """
+    Aggregates the silver products of a day into the daily partitions of the gold tables and publishes their
+    window up to that day. The missing daily partitions of the window are written first when their silver
+    products exist, so the first run after a deploy publishes a complete window. See `write_daily` and
+    `publish`.
+
+    Args:
+        day (datetime.datetime): The day whose silver products landed.
+        tables (list): The keys of the published gold tables, from GOLD_TABLES. Defaults to all of them.
+
+    Returns:
+        dict: The gold tables written, by their key in S3.
+    """
+    write_daily(day, tables)
+    _seed_daily(day, tables)
+    return publish(day, tables)
+
+
+def backfill(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    tables: List[str] = list(GOLD_TABLES),
+    workers: int = BACKFILL_WORKERS,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Rebuilds the daily partitions of the gold tables of every day from `start` to `end`, e.g. after a backfill of
+    the silver products, and publishes the tables again over their usual window, the GOLD_TIMEFRAME_LIMIT days
+    up to the latest daily partition of each table, so the dashboards keep showing the latest days.
+
+    The category tree is loaded once and the days are aggregated in parallel by a pool of `workers` threads.
+
+    Args:
+        start (datetime.datetime): The first day to rebuild.
+        end (datetime.datetime): The last day to rebuild.
+        tables (list): The keys of the published gold tables, from GOLD_TABLES. Defaults to all of them.
+        workers (int): The days aggregated at the same time. Defaults to BACKFILL_WORKERS.
+
+    Returns:
+        dict: The gold tables written, by their key in S3.
+    """
+    category_tree = (
+        CategoryTree.load() if S3_BUCKET_GOLD_CATEGORIES_PATH in tables else None
+    )
+    days = [
+        start + datetime.timedelta(i)
+        for i in range((end.date() - start.date()).days + 1)
+    ]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        list(
+            executor.map(
+                lambda day: write_daily(day, tables, category_tree=category_tree),
+                days,
+            )
+        )
+    gold = {}
+    for key in tables:
+        latest = _latest_partition(GOLD_TABLES[key][0])
+        if latest is not None:
+            gold.update(publish(datetime.datetime.fromisoformat(latest), [key]))
+    return gold
@@ -0,0 +1,88 @@
+from typing import Dict, List, Tuple
+import pandas as pd
+
+# the partial aggregates a metric is computed from, and how partials of finer groups combine into coarser ones
+PARTIALS = {
+    "sum": ["sum"],
+    "count": ["count"],
+    "min": ["min"],
+    "max": ["max"],
+    "mean": ["sum", "count"],
+}
+ROLLUPS = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def aggregate_grouping_sets(
+    df: pd.DataFrame,
+    grouping_sets: List[List[str]],
+    aggregations: Dict[str, Tuple[str, str]],
+    total: str = "--",
+) -> pd.DataFrame:
+    """
+    Aggregates a DataFrame by several grouping sets at once, as `GROUP BY GROUPING SETS` does in SQL.
+
+    The rows are grouped a single time, by the union of the keys of every grouping set, into the partial
+    aggregates of every metric (a mean is a sum and a count), null keys included. Every grouping set is then
+    rolled up from those partials, which are far fewer than the rows, and the metrics are computed from them.
+    The groups of every set are sorted by their keys, as `groupby` does, and stacked in the order of
+    `grouping_sets`.
+
+    Args:
+        df (pd.DataFrame): The rows to aggregate.
+        grouping_sets (list): The key columns of every grouping set. An empty list aggregates all the rows.
+        aggregations (dict): The metrics by output column, as (column, function) tuples like the named
+            aggregations of `groupby.agg`. The function is one of "sum", "count", "min", "max" or "mean".
+        total (str): The value of the keys a grouping set does not group by. Defaults to "--".
+
+    Returns:
+        pd.DataFrame: A DataFrame with the keys of every grouping set followed by the metrics, one row per group.
+    """
+    for column, function in aggregations.values():
+        if function not in PARTIALS:
+            raise ValueError(f"Unsupported aggregation {function} of {column}")
+    keys = list(
+        dict.fromkeys(key for grouping_set in grouping_sets for key in grouping_set)
+    )
+    partials = {
+        f"{column}__{partial}": (column, partial)
+        for column, function in aggregations.values()
+        for partial in PARTIALS[function]
+    }
+    # null keys are kept, so the rows with a null in a key that a set does not group by still count in it
+    finest = df.groupby(keys, observed=True, sort=True, dropna=False).agg(**partials)
+    finest_keys = finest.index.to_frame(index=False)
+    rollups = {name: ROLLUPS[partial] for name, (_, partial) in partials.items()}
+    returned = []
+    for grouping_set in grouping_sets:
+        # as with groupby, a set has no group with a null key
+        grouped = finest[finest_keys[grouping_set].notna().all(axis=1).to_numpy()]
+        if list(grouping_set) == keys:
+            rolled = grouped.reset_index()
+        elif grouping_set:
+            rolled = (
+                grouped.groupby(level=grouping_set, observed=True, sort=True)
+                .agg(rollups)
+                .reset_index()
+            )
+        else:
+            rolled = grouped.agg(rollups).to_frame().T.infer_objects()
+        metrics = {
+            name: (
+                rolled[f"{column}__sum"] / rolled[f"{column}__count"]
+                if function == "mean"
+                else rolled[f"{column}__{function}"]
+            )
+            for name, (column, function) in aggregations.items()
+        }
+        returned.append(
+            pd.DataFrame(
+                {
+                    **{
+                        key: rolled[key] if key in grouping_set else total
+                        for key in keys
+                    },
+                    **metrics,
+                }
+            )
+        )
+    return pd.concat(returned, ignore_index=True)
@@ -0,0 +1,191 @@
+import os
+import tempfile
+import uuid
+from typing import Dict, List, Optional, Tuple
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import awswrangler as wr
+from .utils import (
+    PARQUET_BLOOM_FILTER_COLUMNS,
+    PARQUET_BLOOM_FILTER_FPP,
+    PARQUET_COMPRESSION,
+    PARQUET_COMPRESSION_LEVEL,
+    PARQUET_ROW_GROUP_SIZE,
+    PARQUET_SORT_BY,
+    S3_BUCKET_DATA,
+    S3_CLIENT,
+)
+
+# pyarrow writes Parquet bloom filters since version 24
+BLOOM_FILTERS_SUPPORTED = int(pa.__version__.split(".")[0]) >= 24
+
+
+class ParquetLayout:
+    """
+    Physical layout of the Parquet files of the products datasets.
+
+    Rows are sorted by `sort_by` (the keys missing from a table are skipped) and written in row groups of at most
+    `row_group_size` rows, so the min/max statistics of each row group cover a narrow range of categories and
+    products and readers filtering by them can skip most row groups. The sort order is recorded as the sorting
+    columns of the row groups. Column statistics and the page index (per-page min/max) are written for every
+    column, and a bloom filter for every `bloom_filter_columns` column of the table, so single-product lookups
+    skip the row groups without the product. Bloom filters are only written with pyarrow 24 or later, older
+    versions rely on the page index alone.
+
+    Args:
+        sort_by (list): The columns to sort by. Defaults to PARQUET_SORT_BY.
+        row_group_size (int): The maximum rows of a row group. Defaults to PARQUET_ROW_GROUP_SIZE.
+        compression (str): The compression codec. Defaults to PARQUET_COMPRESSION.
+        compression_level (int): The level of the codec. Defaults to PARQUET_COMPRESSION_LEVEL.
+        write_statistics (bool): Whether to write column statistics. Defaults to True.
+        write_page_index (bool): Whether to write the page index. Defaults to True.
+        bloom_filter_columns (list): The columns with a bloom filter. Defaults to PARQUET_BLOOM_FILTER_COLUMNS.
+    """
+
+    def __init__(
+        self,
+        sort_by: List[str] = PARQUET_SORT_BY,
+        row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+        compression: str = PARQUET_COMPRESSION,
+        compression_level: Optional[int] = PARQUET_COMPRESSION_LEVEL,
+        write_statistics: bool = True,
+        write_page_index: bool = True,
+        bloom_filter_columns: List[str] = PARQUET_BLOOM_FILTER_COLUMNS,
+    ):
+        self.sort_by = sort_by
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.compression_level = compression_level
+        self.write_statistics = write_statistics
+        self.write_page_index = write_page_index
+        self.bloom_filter_columns = bloom_filter_columns
+
+    def _sort_keys(self, schema: pa.Schema) -> List[Tuple[str, str]]:
+        return [
+            (column, "ascending") for column in self.sort_by if column in schema.names
+        ]
+
+    def sort(self, table: pa.Table) -> pa.Table:
+        keys = self._sort_keys(table.schema)
+        if not keys:
+            return table
+        if not any(pa.types.is_dictionary(table[column].type) for column, _ in keys):
+            return table.sort_by(keys)
+        # arrow cannot sort dictionary columns, e.g. from pandas categoricals, so they are sorted by their values
+        values = pa.table(
+            {
+                column: (
+                    table[column].cast(table[column].type.value_type)
+                    if pa.types.is_dictionary(table[column].type)
+                    else table[column]
+                )
+                for column, _ in keys
+            }
+        )
+        return table.take(pc.sort_indices(values, sort_keys=keys))
+
+    def writer(self, where: str, schema: pa.Schema) -> pq.ParquetWriter:
+        options = {}
+        bloom_filter_columns = [
+            column for column in self.bloom_filter_columns if column in schema.names
+        ]
+        if BLOOM_FILTERS_SUPPORTED and bloom_filter_columns:
+            # the filters are per row group, so a row group has at most row_group_size distinct values
+            options["bloom_filter_options"] = {
+                column: {"ndv": self.row_group_size, "fpp": PARQUET_BLOOM_FILTER_FPP}
+                for column in bloom_filter_columns
+            }
+        return pq.ParquetWriter(
+            where,
+            schema,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            write_statistics=self.write_statistics,
+            write_page_index=self.write_page_index,
+            sorting_columns=pq.SortingColumn.from_ordering(
+                schema, self._sort_keys(schema)
+            )
+            or None,
+            **options,
+        )
+
+
+class S3PartitionWriter:
+    """
+    Writes the tables of a partition of a dataset in S3 to a single Parquet file with the given layout.
+
+    The file is written locally as tables arrive and uploaded on close, replacing every file of the partition as
+    the `overwrite_partitions` mode of `wr.s3.to_parquet` does. The previous files are deleted after the upload,
+    so the partition is never empty and a failed upload leaves the previous version in place. The partition
+    columns are not stored in the file, as with `wr.s3.to_parquet`. It is meant to be used as a context
+    manager: the partition is replaced on exit, or left as is if an exception was raised.
+
+    Args:
+        dataset_key (str): The key of the dataset in S3_BUCKET_DATA, e.g. S3_BUCKET_BRONZE_PRODUCTS_PATH.
+        partition (dict): The values of the partition columns, e.g. {"date": "2024-08-01"}.
+        schema (pa.Schema): The schema of the tables, partition columns included.
+        layout (ParquetLayout, optional): The layout of the file. Defaults to ParquetLayout().
+    """
+
+    def __init__(
+        self,
+        dataset_key: str,
+        partition: Dict[str, str],
+        schema: pa.Schema,
+        layout: Optional[ParquetLayout] = None,
+    ):
+        self.layout = layout or ParquetLayout()
+        self.partition = partition
+        self.prefix = (
+            dataset_key
+            + "/"
+            + "".join(f"{column}={value}/" for column, value in partition.items())
+        )
+        self.rows = 0
+        for column in partition:
+            if column in schema.names:
+                schema = schema.remove(schema.get_field_index(column))
+        with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
+            self._path = tmp.name
+        self._writer = self.layout.writer(self._path, schema)
+
+    def __enter__(self) -> "S3PartitionWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, table: pa.Table) -> None:
+        table = table.drop_columns(
+            [column for column in self.partition if column in table.schema.names]
+        )
+        self._writer.write_table(
+            self.layout.sort(table), row_group_size=self.layout.row_group_size
+        )
+        self.rows += len(table)
+
+    def close(self) -> None:
+        self._writer.close()
+        key = f"{self.prefix}{uuid.uuid4().hex}.{self.layout.compression}.parquet"
+        try:
+            S3_CLIENT.upload_file(self._path, S3_BUCKET_DATA, key)
+        finally:
+            os.remove(self._path)
+        # the previous files are deleted only once the new one is in place
+        paginator = S3_CLIENT.get_paginator("list_objects_v2")
+        previous = [
+            f"s3://{S3_BUCKET_DATA}/{obj['Key']}"
+            for page in paginator.paginate(Bucket=S3_BUCKET_DATA, Prefix=self.prefix)
+            for obj in page.get("Contents", [])
+            if obj["Key"] != key
+        ]
+        if previous:
+            wr.s3.delete_objects(previous)
+
+    def abort(self) -> None:
+        self._writer.close()
+        os.remove(self._path)
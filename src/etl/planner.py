@@ -0,0 +1,90 @@
+import datetime
+import math
+from typing import List
+import pandas as pd
+from .utils import (
+    MAX_CONCURRENT_REQUESTS,
+    MAX_PRODUCTS,
+    PLANNER_HEADROOM,
+    PLANNER_HISTORY_DAYS,
+    PLANNER_MAX_PRODUCTS,
+    PLANNER_MIN_PRODUCTS,
+    PRODUCTS_PAGE_SIZE,
+    S3_BUCKET_BRONZE_PRODUCTS_PATH,
+    S3_BUCKET_DATA,
+)
+import awswrangler as wr
+
+
+def _download_category_volumes(day: datetime.datetime, history_days: int) -> pd.Series:
+    days = [
+        (day.date() - datetime.timedelta(i)).strftime("%Y-%m-%d")
+        for i in range(1, history_days + 1)
+    ]
+    try:
+        products_bronze = wr.s3.read_parquet(
+            f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_PRODUCTS_PATH}",
+            dataset=True,
+            partition_filter=lambda x: x["date"] in days,
+            columns=["category_id"],
+        )
+    except wr.exceptions.NoFilesFound:
+        return pd.Series(dtype="int64", name="products")
+    # the busiest day of the window is the one the budget has to cover
+    volumes = (
+        products_bronze.groupby(["date", "category_id"], observed=True)
+        .size()
+        .groupby("category_id")
+        .max()
+        .rename("products")
+    )
+    return volumes
+
+
+def _products_budget(products: float, headroom: float) -> int:
+    if pd.isna(products):
+        return MAX_PRODUCTS
+    pages = math.ceil(products * headroom / PRODUCTS_PAGE_SIZE)
+    budget = pages * PRODUCTS_PAGE_SIZE
+    return min(max(budget, PLANNER_MIN_PRODUCTS), PLANNER_MAX_PRODUCTS)
+
+
+def plan_category_budgets(
+    day: datetime.datetime,
+    category_ids: List[int],
+    history_days: int = PLANNER_HISTORY_DAYS,
+    headroom: float = PLANNER_HEADROOM,
+) -> pd.DataFrame:
+    """
+    Plans the request budget of every category from the volumes it had in the bronze products of the previous days.
+
+    Categories without history get the default MAX_PRODUCTS budget.
+
+    Args:
+        day (datetime.datetime): The day the budget is planned for. Only the days before it are read.
+        category_ids (List[int]): The IDs of the categories to plan.
+        history_days (int): The number of previous days to look at. Defaults to PLANNER_HISTORY_DAYS.
+        headroom (float): The growth factor applied over the busiest day of the history. Defaults to PLANNER_HEADROOM.
+
+    Returns:
+        pd.DataFrame: A DataFrame with the following columns:
+            - category_id (int): The ID of the category.
+            - max_products (int): The maximum number of products to download, a multiple of the page size.
+            - max_concurrency (int): The maximum number of requests in flight for the category.
+    """
+    volumes = _download_category_volumes(day, history_days)
+    budgets = (
+        pd.DataFrame({"category_id": category_ids})
+        .drop_duplicates()
+        .merge(volumes.reset_index(), on="category_id", how="left")
+        .assign(
+            max_products=lambda x: x["products"].apply(
+                lambda y: _products_budget(y, headroom)
+            ),
+            max_concurrency=lambda x: (x["max_products"] // PRODUCTS_PAGE_SIZE).clip(
+                upper=MAX_CONCURRENT_REQUESTS
+            ),
+        )
+        .loc[:, ["category_id", "max_products", "max_concurrency"]]
+    )
+    return budgets
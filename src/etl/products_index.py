@@ -0,0 +1,107 @@
+import datetime
+from typing import Dict, List, Tuple
+import pandas as pd
+import awswrangler as wr
+from .utils import (
+    S3_BUCKET_BRONZE_PRODUCTS_PATH,
+    S3_BUCKET_DATA,
+    S3_BUCKET_RAW_PRODUCTS_INDEX_PATH,
+    S3_CLIENT,
+)
+
+
+def _fingerprint(search_object: Dict) -> Tuple:
+    content = search_object.get("content", search_object)
+    return content.get("price"), content.get("modification_date")
+
+
+def _bronze_partition_exists(date: str) -> bool:
+    return (
+        S3_CLIENT.list_objects_v2(
+            Bucket=S3_BUCKET_DATA,
+            Prefix=f"{S3_BUCKET_BRONZE_PRODUCTS_PATH}/date={date}/",
+            MaxKeys=1,
+        )["KeyCount"]
+        > 0
+    )
+
+
+class ProductsIndex:
+    """
+    Seen-products index of a category, used by the incremental raw ingestion.
+
+    It keeps the last seen price and modification date of every product of the category, and the day it was
+    last seen. A product is unchanged if it was seen the day before with the same price and modification date.
+    Unchanged products are stored in raw as a slim `{"id", "category_id", "unchanged": True}` record, and
+    `etl.bronze.products` takes the rest of their fields from the previous day's bronze partition. That is
+    why only products seen exactly the day before can be slimmed: their full row is in that partition. The index
+    is updated when raw succeeds, so nothing is slimmed if the bronze partition of the day before does not exist.
+
+    The index is a small Parquet file per category sorted by `product_id`.
+
+    Args:
+        category_id (int): The ID of the category.
+        day (datetime.datetime): The day being downloaded.
+    """
+
+    def __init__(self, category_id: int, day: datetime.datetime):
+        self.category_id = category_id
+        self.day = day.date().strftime("%Y-%m-%d")
+        self.path = f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_RAW_PRODUCTS_INDEX_PATH}/{category_id}.parquet"
+        previous_day = (day.date() - datetime.timedelta(1)).strftime("%Y-%m-%d")
+        try:
+            index = wr.s3.read_parquet(self.path)
+        except wr.exceptions.NoFilesFound:
+            index = pd.DataFrame(
+                columns=["product_id", "price", "modification_date", "last_seen"]
+            )
+        if not _bronze_partition_exists(previous_day):
+            print(
+                f"No bronze products of {previous_day}, no product of category {category_id} is slimmed"
+            )
+            index = index.iloc[0:0]
+        self._previous = {
+            product_id: (price, modification_date)
+            for product_id, price, modification_date in index.loc[
+                index["last_seen"] == previous_day,
+                ["product_id", "price", "modification_date"],
+            ].itertuples(index=False)
+        }
+        self._seen = {}
+
+    def slim(self, search_objects: List[Dict]) -> List[Dict]:
+        """
+        Records the given search objects in the index and replaces the unchanged ones by slim records.
+        """
+        returned = []
+        for search_object in search_objects:
+            fingerprint = _fingerprint(search_object)
+            self._seen[search_object["id"]] = fingerprint
+            if self._previous.get(search_object["id"]) == fingerprint:
+                returned.append(
+                    {
+                        "id": search_object["id"],
+                        "category_id": search_object["category_id"],
+                        "unchanged": True,
+                    }
+                )
+            else:
+                returned.append(search_object)
+        return returned
+
+    def save(self) -> None:
+        """
+        Writes the products seen today to the index of the category.
+        """
+        index = (
+            pd.DataFrame(
+                [
+                    (product_id, price, modification_date)
+                    for product_id, (price, modification_date) in self._seen.items()
+                ],
+                columns=["product_id", "price", "modification_date"],
+            )
+            .assign(last_seen=self.day)
+            .sort_values("product_id")
+        )
+        wr.s3.to_parquet(index, path=self.path, index=False)
@@ -1,10 +1,29 @@
 import datetime
-from itertools import chain
-from typing import Dict, List
+import email.utils
+import hashlib
+import json
+import math
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 import requests
 import asyncio
+import random
+import time
 import uuid
-from .utils import HEADERS, URLS, MAX_PRODUCTS
+import aiohttp
+from .utils import (
+    HEADERS,
+    URLS,
+    MAX_PRODUCTS,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_REQUESTS_PER_SECOND,
+    MAX_RETRIES,
+    PAGINATION_WINDOW,
+    PRODUCTS_PAGE_SIZE,
+    REQUEST_TIMEOUT,
+    RETRYABLE_STATUS_CODES,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_CAP,
+)
 
 
 def _generate_device_id() -> str:
@@ -12,21 +31,256 @@ def _generate_device_id() -> str:
     return generated
 
 
-def download_categories(day: datetime.datetime) -> Dict:
+def categories_hash(categories: Dict) -> str:
+    """
+    Computes a content hash of a category tree, ignoring the download date.
+    """
+    content = json.dumps(categories["categories"], sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def download_categories(
+    day: datetime.datetime,
+    etag: Optional[str] = None,
+    url: str = URLS["categories"],
+) -> Tuple[Optional[Dict], Optional[str]]:
     """
     Downloads the categories from the API based on the given date.
 
     Parameters:
         date (datetime.datetime): The date for which the categories should be downloaded. If not provided, the current date is used.
+        etag (Optional[str]): The ETag of the last downloaded categories. If given, it is sent as `If-None-Match`.
+        url (str): The URL of the categories endpoint. Defaults to URLS["categories"].
 
     Returns:
-        dict: A dictionary containing the downloaded categories.
+        Tuple[Optional[dict], Optional[str]]: A dictionary containing the downloaded categories, or None if the API
+            answered that they did not change since `etag`, and the ETag of the response, if any.
+    """
+    headers = {**HEADERS, "X-DeviceID": _generate_device_id()}
+    if etag is not None:
+        headers["If-None-Match"] = etag
+    response = requests.get(url, headers=headers)
+    if response.status_code == 304:
+        return None, etag
+    returned = response.json()
+    returned["date"] = day.date().isoformat()
+    return returned, response.headers.get("ETag")
+
+
+def _build_session(
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+    timeout: float = REQUEST_TIMEOUT,
+    trace_configs: Optional[List[aiohttp.TraceConfig]] = None,
+) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(limit=max_concurrency, keepalive_timeout=60)
+    session = aiohttp.ClientSession(
+        connector=connector,
+        trace_configs=trace_configs,
+        # aiohttp only decodes gzip/deflate out of the box
+        headers={
+            **HEADERS,
+            "Accept-Encoding": "gzip, deflate",
+            "X-DeviceID": _generate_device_id(),
+        },
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    )
+    return session
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket that limits the rate of the requests sent to the API.
+
+    Every request takes a token before being sent. Tokens are refilled at `rate` per second up to `capacity`,
+    so short bursts are allowed while the sustained rate stays at `rate`. A throttling response pauses the
+    whole bucket, so every request sharing it backs off and not only the throttled one.
+
+    Args:
+        rate (float): The number of tokens added per second.
+        capacity (Optional[int]): The maximum number of tokens stored. Defaults to `rate`.
     """
-    response = requests.get(
-        URLS["categories"], headers={**HEADERS, "X-DeviceID": _generate_device_id()}
-    ).json()
-    response["date"] = day.date().isoformat()
-    return response
+
+    def __init__(self, rate: float, capacity: Optional[int] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    # full jitter exponential backoff, unless the API tells us how long to wait
+    backoff = random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2**attempt))
+    if retry_after is None:
+        return backoff
+    try:
+        wait = float(retry_after)
+    except ValueError:
+        try:
+            until = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError, IndexError):
+            # a header we cannot read is no reason to fail the category
+            return backoff
+        if until.tzinfo is None:
+            # RFC 5322 dates with a -0000 offset are parsed as naive, they are UTC
+            until = until.replace(tzinfo=datetime.timezone.utc)
+        wait = (until - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    if not math.isfinite(wait):
+        return backoff
+    return max(wait, 0) + random.uniform(0, RETRY_BACKOFF_BASE)
+
+
+async def _download_product_category_index(
+    session: aiohttp.ClientSession,
+    url: str,
+    rate_limiter: TokenBucket,
+    max_retries: int,
+) -> Optional[List]:
+    for attempt in range(max_retries + 1):
+        await rate_limiter.acquire()
+        try:
+            async with session.get(url) as response:
+                if response.status not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    content = await response.json(content_type=None)
+                    return content["search_objects"]
+                delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+                if response.status == 429:
+                    rate_limiter.pause(delay)
+                error = f"status {response.status}"
+        except (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            asyncio.TimeoutError,
+        ) as e:
+            delay = _retry_delay(attempt)
+            error = repr(e)
+        except (aiohttp.ClientResponseError, ValueError, KeyError, TypeError) as e:
+            # client errors and unreadable bodies, e.g. an HTML error page, would fail again if retried
+            print(f"Giving up on page {url}: {type(e).__name__} {e}")
+            return None
+        if attempt < max_retries:
+            await asyncio.sleep(delay)
+    print(f"Giving up on page {url} after {max_retries + 1} attempts: {error}")
+    return None
+
+
+async def _iter_category_pages(
+    session: aiohttp.ClientSession,
+    url: str,
+    category_path_root: str,
+    category_search_path: str,
+    max_products: int,
+    window_size: Optional[int],
+    rate_limiter: TokenBucket,
+    max_retries: int,
+) -> AsyncIterator[Optional[List]]:
+    starts = range(0, max_products, PRODUCTS_PAGE_SIZE)
+    window_size = window_size or len(starts)
+    for window_start in range(0, len(starts), window_size):
+        urls = [
+            url.format(
+                category_path_root=category_path_root,
+                category_search_path=category_search_path,
+                start=start,
+            )
+            for start in starts[window_start : window_start + window_size]
+        ]
+        pages = await asyncio.gather(
+            *[
+                _download_product_category_index(
+                    session, page_url, rate_limiter, max_retries
+                )
+                for page_url in urls
+            ],
+            return_exceptions=True,
+        )
+        for i, page in enumerate(pages):
+            if isinstance(page, Exception):
+                # an unexpected error of a page fails the page, not its window nor the category
+                print(f"Giving up on page {urls[i]}: {page!r}")
+                pages[i] = page = None
+            yield page
+        # a short or empty page means the category has no more products, failed pages (None) say nothing
+        if any(page is not None and len(page) < PRODUCTS_PAGE_SIZE for page in pages):
+            break
+
+
+async def _download_category(
+    session: aiohttp.ClientSession,
+    day: datetime.datetime,
+    category_id: int,
+    category_path_root: str,
+    category_search_path: str,
+    max_products: int,
+    url: str,
+    window_size: Optional[int],
+    rate_limiter: TokenBucket,
+    max_retries: int,
+    on_page: Optional[Callable[[int, List[Dict]], None]],
+) -> Dict:
+    try:
+        returned = {"search_objects": [], "date": day.date().strftime("%Y-%m-%d")}
+        stats = {
+            "pages": 0,
+            "failed_pages": 0,
+            "products": 0,
+            "duplicates": 0,
+        }
+        seen_ids = set()
+        async for page in _iter_category_pages(
+            session,
+            url,
+            category_path_root,
+            category_search_path,
+            max_products,
+            window_size,
+            rate_limiter,
+            max_retries,
+        ):
+            stats["pages"] += 1
+            if page is None:
+                stats["failed_pages"] += 1
+                continue
+            # offset pagination drifts while the pages are being fetched, so items can show up in two pages
+            search_objects = []
+            for x in page:
+                if x["id"] in seen_ids:
+                    continue
+                seen_ids.add(x["id"])
+                search_objects.append({**x, "category_id": category_id})
+            stats["duplicates"] += len(page) - len(search_objects)
+            stats["products"] += len(search_objects)
+            if on_page is None:
+                returned["search_objects"].extend(search_objects)
+            elif search_objects:
+                on_page(category_id, search_objects)
+        returned["stats"] = stats
+        return returned
+    except Exception as e:
+        print(
+            f"Error downloading raw products {day} {category_path_root}-{category_search_path}: {e}"
+        )
+        raise
 
 
 async def download_products_by_category(
@@ -35,54 +289,142 @@ async def download_products_by_category(
     category_path_root: str,
     category_search_path: str,
     max_products: int = MAX_PRODUCTS,
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+    timeout: float = REQUEST_TIMEOUT,
+    url: str = URLS["products_category"],
+    window_size: Optional[int] = PAGINATION_WINDOW,
+    rate_limiter: Optional[TokenBucket] = None,
+    max_retries: int = MAX_RETRIES,
+    on_page: Optional[Callable[[int, List[Dict]], None]] = None,
+    trace_configs: Optional[List[aiohttp.TraceConfig]] = None,
 ) -> Dict:
     """
     Downloads the products from the API for a given category.
 
+    All the pages are requested through a single pooled keep-alive session, so at most `max_concurrency`
+    connections are opened against the API during the whole download. Pages are requested in windows of
+    `window_size` parallel requests and no more windows are sent once the API returns a short or empty page.
+
+    Every request goes through `rate_limiter`. Throttled (429), server error (5xx) and timed out pages are
+    retried on their own, honouring the `Retry-After` header or with jittered exponential backoff. A page that
+    still fails after `max_retries` retries, or that fails for good (another 4xx status or a body that is not the
+    expected JSON), is skipped and counted in the `failed_pages` stat instead of failing the whole category.
+
+    Items are deduplicated by ID as pages arrive, since offset pagination drifts while the marketplace changes.
+    The `duplicates` stat counts the dropped items.
+
     Parameters:
         day (datetime.datetime): The date for which the products should be downloaded. If not provided, the current date is used.
         category_id (int): The ID of the category to download the products from.
         category_path_root (str): The root path of the category on the API.
         category_search_path (str): The search path of the category on the API.
         max_products (int): The maximum number of products to download. Defaults to MAX_PRODUCTS.
+        max_concurrency (int): The maximum number of requests in flight. Defaults to MAX_CONCURRENT_REQUESTS.
+        timeout (float): The timeout in seconds of every page request. Defaults to REQUEST_TIMEOUT.
+        url (str): The URL template of the products endpoint. Defaults to URLS["products_category"].
+        window_size (Optional[int]): The number of pages requested in parallel before checking for the end of the
+            category. If None, all the pages up to `max_products` are requested at once. Defaults to PAGINATION_WINDOW.
+        rate_limiter (Optional[TokenBucket]): The token bucket shared by the requests. Defaults to a new bucket of
+            MAX_REQUESTS_PER_SECOND.
+        max_retries (int): The maximum number of retries of every page. Defaults to MAX_RETRIES.
+        on_page (Optional[Callable[[int, List[Dict]], None]]): If given, it is called with the category ID and the
+            search objects of every page as soon as the page arrives, and the search objects are not kept in the
+            returned dictionary. Useful to stream the products to storage.
+        trace_configs (Optional[List[aiohttp.TraceConfig]]): aiohttp trace configs of the session, to instrument
+            the requests.
 
     Returns:
-        dict: A dictionary containing the downloaded products.
+        dict: A dictionary containing the downloaded products and the `stats` of the download (pages, failed pages,
+            products and duplicates).
     """
+    rate_limiter = rate_limiter or TokenBucket(MAX_REQUESTS_PER_SECOND)
+    async with _build_session(max_concurrency, timeout, trace_configs) as session:
+        returned = await _download_category(
+            session,
+            day,
+            category_id,
+            category_path_root,
+            category_search_path,
+            max_products,
+            url,
+            window_size,
+            rate_limiter,
+            max_retries,
+            on_page,
+        )
+    return returned
 
-    async def _download_product_category_index(url: str, headers: Dict) -> List:
-        response = await asyncio.to_thread(requests.get, url, headers=headers)
-        return response.json()["search_objects"]
 
-    try:
-        returned = {"search_objects": [], "date": day.date().strftime("%Y-%m-%d")}
+async def download_products_by_categories(
+    day: datetime.datetime,
+    categories: List[Dict],
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+    timeout: float = REQUEST_TIMEOUT,
+    url: str = URLS["products_category"],
+    window_size: Optional[int] = PAGINATION_WINDOW,
+    rate_limiter: Optional[TokenBucket] = None,
+    max_retries: int = MAX_RETRIES,
+    on_page: Optional[Callable[[int, List[Dict]], None]] = None,
+    trace_configs: Optional[List[aiohttp.TraceConfig]] = None,
+) -> Dict[int, Dict]:
+    """
+    Downloads the products from the API for a batch of categories in a single event loop.
+
+    Every category is downloaded as in `download_products_by_category`, but all of them share the same pooled
+    session, so `max_concurrency` is a global limit on the requests in flight, and the same `rate_limiter`. The
+    `max_concurrency` planned for a category, if any, caps its `window_size`. A category that fails does not
+    fail the rest of the batch.
+
+    Parameters:
+        day (datetime.datetime): The date for which the products should be downloaded.
+        categories (List[Dict]): The categories to download. Every category needs the `category_id`,
+            `category_path_root` and `category_search_path` keys and may have the `max_products` and
+            `max_concurrency` of its budget.
+        max_concurrency (int): The maximum number of requests in flight for the whole batch. Defaults to MAX_CONCURRENT_REQUESTS.
+        timeout (float): The timeout in seconds of every page request. Defaults to REQUEST_TIMEOUT.
+        url (str): The URL template of the products endpoint. Defaults to URLS["products_category"].
+        window_size (Optional[int]): The number of pages of a category requested in parallel before checking for
+            the end of the category. Defaults to PAGINATION_WINDOW.
+        rate_limiter (Optional[TokenBucket]): The token bucket shared by the requests. Defaults to a new bucket of
+            MAX_REQUESTS_PER_SECOND.
+        max_retries (int): The maximum number of retries of every page. Defaults to MAX_RETRIES.
+        on_page (Optional[Callable[[int, List[Dict]], None]]): If given, it is called with the category ID and the
+            search objects of every page as soon as the page arrives, as in `download_products_by_category`.
+        trace_configs (Optional[List[aiohttp.TraceConfig]]): aiohttp trace configs of the session, to instrument
+            the requests.
+
+    Returns:
+        Dict[int, Dict]: The result of every category by category ID. It is either the dictionary returned by
+            `download_products_by_category` or the exception that made the category fail.
+    """
+    rate_limiter = rate_limiter or TokenBucket(MAX_REQUESTS_PER_SECOND)
+    async with _build_session(max_concurrency, timeout, trace_configs) as session:
         results = await asyncio.gather(
             *[
-                _download_product_category_index(
-                    URLS["products_category"].format(
-                        category_path_root=category_path_root,
-                        category_search_path=category_search_path,
-                        start=start,
+                _download_category(
+                    session,
+                    day,
+                    category["category_id"],
+                    category["category_path_root"],
+                    category["category_search_path"],
+                    category.get("max_products") or MAX_PRODUCTS,
+                    url,
+                    min(
+                        filter(None, [window_size, category.get("max_concurrency")]),
+                        default=None,
                     ),
-                    {**HEADERS, "X-DeviceID": _generate_device_id()},
+                    rate_limiter,
+                    max_retries,
+                    on_page,
                 )
-                for start in range(
-                    0, max_products, 40
-                )  # because Wallapop API only allows 40 items per request
-            ]
+                for category in categories
+            ],
+            return_exceptions=True,
         )
-        returned["search_objects"] = list(
-            map(
-                lambda x: {**x, "category_id": category_id},
-                chain.from_iterable(list(filter(lambda x: x != [], results))),
-            )
-        )
-        return returned
-    except Exception as e:
-        print(
-            f"Error downloading raw products {day} {category_path_root}-{category_search_path}: {e}"
-        )
-        raise
+    returned = {
+        category["category_id"]: result for category, result in zip(categories, results)
+    }
+    return returned
 
 
 if __name__ == "__main__":
@@ -1,18 +1,119 @@
+import concurrent.futures
 import datetime
+from typing import Dict, List, Optional
 
 import pandas as pd
+import pyarrow as pa
+from .category_tree import CategoryTree
+from .parquet_layout import S3PartitionWriter
 from .utils import (
+    BACKFILL_WORKERS,
     S3_BUCKET_DATA,
-    S3_BUCKET_BRONZE_CATEGORIES_PATH,
+    S3_BUCKET_BRONZE_CATEGORY_TREE_PATH,
     S3_BUCKET_BRONZE_PRODUCTS_PATH,
+    S3_BUCKET_SILVER_PRODUCTS_MANIFESTS_PATH,
+    S3_BUCKET_SILVER_PRODUCTS_PATH,
+    S3_CLIENT,
+    load_json_from_s3,
+    save_json_to_s3,
 )
 import awswrangler as wr
 
+# compact types of the silver products, categoricals are written as dictionary encoded Parquet columns
+SILVER_PRODUCTS_DTYPES = {
+    "category_id": "int32",
+    "category_name": "category",
+    "category_hierarchy": "category",
+    "currency": "category",
+    "country_code": "category",
+    "city": "category",
+    "postal_code": "category",
+    # nullable, as bronze leaves the creation dates it cannot parse empty
+    "days_since_creation": "Int16",
+}
+
+
+SILVER_PRODUCTS_COLUMNS = [
+    "product_id",
+    "user_id",
+    "category_id",
+    "created_at",
+    "title",
+    "web_slug",
+    "category_name",
+    "category_hierarchy",
+    "price",
+    "currency",
+    "country_code",
+    "city",
+    "postal_code",
+    "date",
+]
+
+
+def _download_products_bronze(day: datetime.datetime) -> pd.DataFrame:
+    products_bronze = wr.s3.read_parquet(
+        f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_PRODUCTS_PATH}",
+        dataset=True,
+        partition_filter=lambda x: x["date"] == day.date().strftime("%Y-%m-%d"),
+    )
+    return products_bronze
+
+
+def build_products(
+    products_bronze: pd.DataFrame,
+    category_tree: CategoryTree,
+    day: datetime.datetime,
+) -> pd.DataFrame:
+    """
+    Builds the silver products of a day from its bronze products, without any IO.
+
+    The category name and hierarchy are looked up by the integer category_id in the category tree, and
+    `created_at` is parsed once into a UTC timestamp, so `days_since_creation` is plain datetime arithmetic
+    over the whole column. The typed bronze partitions only keep the UTC timestamp, so their days count from
+    the UTC date of creation, a day apart from the local date of the listing for products created near
+    midnight with a zone offset.
+
+    Args:
+        products_bronze (pd.DataFrame): The bronze products of the day.
+        category_tree (CategoryTree): The category tree of the bronze layer.
+        day (datetime.datetime): The day of the products.
+
+    Returns:
+        pd.DataFrame: The silver products of the day.
+    """
+    created_at = products_bronze["created_at"]
+    if pd.api.types.is_datetime64_any_dtype(created_at):
+        created_on = created_at.dt.floor("D")
+    else:
+        # partitions written before the typed bronze schema have ISO strings, with or without milliseconds,
+        # whose days since creation count from the local date of the string as they always did
+        created_on = pd.to_datetime(
+            created_at.str.slice(0, 10), format="%Y-%m-%d", utc=True
+        )
+        created_at = pd.to_datetime(created_at, utc=True, format="ISO8601")
+    category_ids = products_bronze["category_id"].to_numpy()
+    returned = (
+        products_bronze.assign(
+            created_at=created_at,
+            category_name=category_tree.name_of(category_ids),
+            category_hierarchy=category_tree.hierarchy_of(category_ids),
+            days_since_creation=(
+                pd.Timestamp(day.date(), tz="UTC") - created_on
+            ).dt.days,
+        )
+        .loc[:, SILVER_PRODUCTS_COLUMNS + ["days_since_creation"]]
+        .astype(SILVER_PRODUCTS_DTYPES)
+    )
+    return returned
+
 
 def products(day: datetime.datetime) -> pd.DataFrame:
     """
-    Reads bronze categories and products data from S3, merges them on category_id,
-    and returns a DataFrame with selected columns.
+    Reads bronze products data from S3, adds the name and hierarchy of their category_id
+    from the category tree of the bronze layer, and returns a DataFrame with selected columns.
+
+    See `build_products`.
 
     Args:
         day (datetime.datetime): The date to filter the products data on.
@@ -20,54 +121,126 @@ def products(day: datetime.datetime) -> pd.DataFrame:
     Returns:
         pd.DataFrame: The merged DataFrame.
     """
-    # read categories from S3
-    categories_bronze = wr.s3.read_parquet(
-        f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_CATEGORIES_PATH}", dataset=True
-    )
-    # read products from S3
-    products_bronze = wr.s3.read_parquet(
-        f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_PRODUCTS_PATH}",
-        dataset=True,
-        partition_filter=lambda x: x["date"] == day.date().strftime("%Y-%m-%d"),
+    return build_products(_download_products_bronze(day), CategoryTree.load(), day)
+
+
+def _input_fingerprints(day: datetime.datetime) -> Dict[str, str]:
+    # the ETag of every file silver reads for the day: the bronze partition and the category tree
+    paginator = S3_CLIENT.get_paginator("list_objects_v2")
+    prefix = f"{S3_BUCKET_BRONZE_PRODUCTS_PATH}/date={day.date().strftime('%Y-%m-%d')}/"
+    fingerprints = {
+        obj["Key"]: obj["ETag"]
+        for page in paginator.paginate(Bucket=S3_BUCKET_DATA, Prefix=prefix)
+        for obj in page.get("Contents", [])
+    }
+    fingerprints[S3_BUCKET_BRONZE_CATEGORY_TREE_PATH] = S3_CLIENT.head_object(
+        Bucket=S3_BUCKET_DATA, Key=S3_BUCKET_BRONZE_CATEGORY_TREE_PATH
+    )["ETag"]
+    return fingerprints
+
+
+def _manifest_key(day: datetime.datetime) -> str:
+    return f"{S3_BUCKET_SILVER_PRODUCTS_MANIFESTS_PATH}/{day.date().strftime('%Y-%m-%d')}.json"
+
+
+def write_products(
+    day: datetime.datetime,
+    force: bool = False,
+    category_tree: Optional[CategoryTree] = None,
+) -> Dict:
+    """
+    Builds the silver products of a day and writes them to its partition of the silver products dataset, unless
+    its inputs did not change since the last build.
+
+    Every build records a manifest with the fingerprints of the files it consumed (the ETags of the bronze
+    partition files and of the category tree) and the rows read and written. When the current fingerprints
+    match the manifest the partition is already up to date, so re-runs and retries skip the build.
+
+    Args:
+        day (datetime.datetime): The day to build.
+        force (bool): Whether to build even if the inputs did not change. Defaults to False.
+        category_tree (CategoryTree, optional): The category tree, to share it among days. Loaded if not given.
+
+    Returns:
+        dict: The manifest of the build, with `skipped` set to whether the build was skipped.
+    """
+    date = day.date().strftime("%Y-%m-%d")
+    fingerprints = _input_fingerprints(day)
+    manifest = load_json_from_s3(S3_BUCKET_DATA, _manifest_key(day))
+    if not force and manifest is not None and manifest["inputs"] == fingerprints:
+        print(f"Inputs of the silver products of {date} did not change, skipping")
+        return {**manifest, "skipped": True}
+    products_bronze = _download_products_bronze(day)
+    silver_products = pa.Table.from_pandas(
+        build_products(products_bronze, category_tree or CategoryTree.load(), day),
+        preserve_index=False,
     )
-    merged = (
-        products_bronze.assign()
-        .set_index("category_id")
-        .merge(
-            categories_bronze.loc[
-                :, ["category_id", "category_name", "category_hierarchy"]
-            ].set_index("category_id"),
-            left_index=True,
-            right_index=True,
-            how="left",
-        )
-        .reset_index()
-        .loc[
-            :,
-            [
-                "product_id",
-                "user_id",
-                "category_id",
-                "created_at",
-                "title",
-                "web_slug",
-                "category_name",
-                "category_hierarchy",
-                "price",
-                "currency",
-                "country_code",
-                "city",
-                "postal_code",
-                "date",
-            ],
-        ]
-        .assign(
-            days_since_creation=lambda x: x["created_at"].apply(
-                lambda x: (
-                    day.date()
-                    - datetime.datetime.strptime(x.split("T")[0], "%Y-%m-%d").date()
-                ).days
-            )
+    with S3PartitionWriter(
+        S3_BUCKET_SILVER_PRODUCTS_PATH, {"date": date}, silver_products.schema
+    ) as writer:
+        writer.write(silver_products)
+    manifest = {
+        "date": date,
+        "inputs": fingerprints,
+        "rows_in": len(products_bronze),
+        "rows_out": writer.rows,
+        "built_at": datetime.datetime.now().isoformat(),
+    }
+    save_json_to_s3(S3_BUCKET_DATA, _manifest_key(day), manifest)
+    return {**manifest, "skipped": False}
+
+
+def write_changed_products(
+    days: List[datetime.datetime],
+    force: bool = False,
+    workers: int = BACKFILL_WORKERS,
+) -> Dict[str, Dict]:
+    """
+    Builds the silver products of the given days only, the partitions known to have changed. The category tree
+    is loaded once and shared, and the days are built in parallel by a pool of `workers` threads, every
+    partition written once. See `write_products`.
+
+    Args:
+        days (list): The days to build.
+        force (bool): Whether to build even if the inputs did not change. Defaults to False.
+        workers (int): The days built at the same time. Defaults to BACKFILL_WORKERS.
+
+    Returns:
+        dict: The manifest of the build of every day, by date.
+    """
+    category_tree = CategoryTree.load()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        manifests = executor.map(
+            lambda day: write_products(day, force=force, category_tree=category_tree),
+            days,
         )
-    )
-    return merged
+        return {
+            day.date().strftime("%Y-%m-%d"): manifest
+            for day, manifest in zip(days, manifests)
+        }
+
+
+def backfill_products(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    force: bool = False,
+    workers: int = BACKFILL_WORKERS,
+) -> Dict[str, Dict]:
+    """
+    Builds the silver products of every day from `start` to `end`, both included. See `write_changed_products`.
+
+    Args:
+        start (datetime.datetime): The first day to build.
+        end (datetime.datetime): The last day to build.
+        force (bool): Whether to build even if the inputs did not change, e.g. after a change of the silver
+            build itself. Defaults to False.
+        workers (int): The days built at the same time. Defaults to BACKFILL_WORKERS.
+
+    Returns:
+        dict: The manifest of the build of every day, by date.
+    """
+    days = [
+        start + datetime.timedelta(i)
+        for i in range((end.date() - start.date()).days + 1)
+    ]
+    return write_changed_products(days, force=force, workers=workers)
@@ -1,17 +1,35 @@
+import gzip
+import io
 import json
-from typing import Dict
+import os
+import zlib
+from typing import IO, Dict, Iterable, Optional
 
 import boto3
 
+try:
+    import zstandard
+except ImportError:  # only needed to write or read zstd compressed raw files
+    zstandard = None
+
 S3_BUCKET_DATA = "cgarcia.cidaen.tfm.datalake"
 S3_BUCKET_RAW_CATEGORY_PATH = "raw/categories"
+S3_BUCKET_RAW_CATEGORY_STATE_PATH = "raw/categories_state.json"
 S3_BUCKET_RAW_PRODUCTS_CATEGORY_PATH = "raw/products_category/{day}"
+S3_BUCKET_RAW_PRODUCTS_INDEX_PATH = "raw/products_index"
 S3_BUCKET_BRONZE_CATEGORIES_PATH = "bronze/categories"
+S3_BUCKET_BRONZE_CATEGORIES_CACHE_PATH = "bronze/categories_cache"
+S3_BUCKET_BRONZE_CATEGORIES_MANIFEST_PATH = "bronze/categories_manifest.json"
+S3_BUCKET_BRONZE_CATEGORY_TREE_PATH = "bronze/category_tree.parquet"
 S3_BUCKET_BRONZE_PRODUCTS_PATH = "bronze/products"
 S3_BUCKET_SILVER_PRODUCTS_PATH = "silver/products"
+S3_BUCKET_SILVER_PRODUCTS_MANIFESTS_PATH = "silver/products_manifests"
 S3_BUCKET_GOLD_CATEGORIES_PATH = "gold/categories.csv"
 S3_BUCKET_GOLD_LOCATIONS_PATH = "gold/locations.csv"
 S3_BUCKET_GOLD_PRODUCTS_PATH = "gold/products.csv"
+S3_BUCKET_GOLD_CATEGORIES_DAILY_PATH = "gold/categories_daily"
+S3_BUCKET_GOLD_LOCATIONS_DAILY_PATH = "gold/locations_daily"
+S3_BUCKET_GOLD_PRODUCTS_DAILY_PATH = "gold/products_daily"
 S3_CLIENT = boto3.client("s3")
 
 HEADERS = {
@@ -46,7 +64,39 @@ URLS = {
 }
 
 MAX_PRODUCTS = 10000
+PRODUCTS_PAGE_SIZE = 40  # Wallapop API only allows 40 items per request
+MAX_CONCURRENT_REQUESTS = 20
+REQUEST_TIMEOUT = 30
+PAGINATION_WINDOW = 10  # pages requested in parallel before looking for the last page
+MAX_REQUESTS_PER_SECOND = 20
+MAX_RETRIES = 4
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_CAP = 30
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
 GOLD_TIMEFRAME_LIMIT = 30
+# partitions of the gold window looked up in S3 at the same time
+GOLD_PARTITION_WORKERS = 16
+# days built at the same time, each one holds a day of products in memory
+BACKFILL_WORKERS = 4
+# days a single invocation of the silver Lambda backfills within its timeout
+BACKFILL_MAX_DAYS = 8
+PLANNER_HISTORY_DAYS = 7
+PLANNER_HEADROOM = 1.5
+PLANNER_MIN_PRODUCTS = 2 * PRODUCTS_PAGE_SIZE
+PLANNER_MAX_PRODUCTS = 2 * MAX_PRODUCTS
+RAW_COMPRESSION = "gzip"
+RAW_EXTENSIONS = {None: ".json", "gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+# S3 needs at least 5 MiB in every part but the last
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+# stored (compressed) raw bytes processed at once by the streaming bronze build
+BRONZE_BATCH_BYTES = 64 * 1024 * 1024
+BRONZE_WORKERS = os.cpu_count() or 1  # processes parsing raw files in the bronze build
+PARQUET_SORT_BY = ["category_id", "product_id"]
+PARQUET_BLOOM_FILTER_COLUMNS = ["product_id"]
+PARQUET_BLOOM_FILTER_FPP = 0.05
+PARQUET_ROW_GROUP_SIZE = 128 * 1024  # rows
+PARQUET_COMPRESSION = "zstd"
+PARQUET_COMPRESSION_LEVEL = 6
 
 
 def save_json_to_s3(bucket_name: str, key: str, json_data: Dict):
@@ -56,3 +106,120 @@ def save_json_to_s3(bucket_name: str, key: str, json_data: Dict):
         Body=json.dumps(json_data),
         ContentType="application/json",
     )
+
+
+def load_json_from_s3(bucket_name: str, key: str) -> Optional[Dict]:
+    try:
+        obj = S3_CLIENT.get_object(Bucket=bucket_name, Key=key)
+    except S3_CLIENT.exceptions.NoSuchKey:
+        return None
+    return json.loads(obj["Body"].read().decode("utf-8"))
+
+
+def raw_products_key(day: str, category_id: int, compression: Optional[str]) -> str:
+    return f"{S3_BUCKET_RAW_PRODUCTS_CATEGORY_PATH.format(day=day)}/{category_id}{RAW_EXTENSIONS[compression]}"
+
+
+class S3NDJSONWriter:
+    """
+    Streams records to an S3 object as compressed NDJSON (one JSON record per line) through a multipart upload.
+
+    Records are compressed as they are written and a part is uploaded every time `part_size` compressed bytes
+    are buffered, so the memory used does not depend on the size of the object. It is meant to be used as a
+    context manager: the upload is completed on exit, or aborted if an exception was raised or no record was
+    written.
+
+    Args:
+        bucket_name (str): The bucket of the object.
+        key (str): The key of the object.
+        compression (str): Either "gzip" or "zstd". Defaults to RAW_COMPRESSION.
+        part_size (int): The compressed bytes buffered before uploading a part. Defaults to MULTIPART_PART_SIZE.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        key: str,
+        compression: str = RAW_COMPRESSION,
+        part_size: int = MULTIPART_PART_SIZE,
+    ):
+        if compression == "gzip":
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif compression == "zstd":
+            if zstandard is None:
+                raise ValueError("zstd compression needs the zstandard package")
+            self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            raise ValueError(f"Unsupported compression {compression}")
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = part_size
+        self.records = 0
+        self._buffer = bytearray()
+        self._parts = []
+        self._upload_id = S3_CLIENT.create_multipart_upload(
+            Bucket=bucket_name, Key=key, ContentType="application/x-ndjson"
+        )["UploadId"]
+
+    def __enter__(self) -> "S3NDJSONWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _upload_part(self) -> None:
+        part_number = len(self._parts) + 1
+        response = S3_CLIENT.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=bytes(self._buffer),
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self._buffer.clear()
+
+    def write(self, records: Iterable[Dict]) -> None:
+        for record in records:
+            self._buffer += self._compressor.compress(
+                (json.dumps(record) + "\n").encode("utf-8")
+            )
+            self.records += 1
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+
+    def close(self) -> None:
+        if not self.records:
+            # an object without records is not worth reading, so none is written
+            self.abort()
+            return
+        self._buffer += self._compressor.flush()
+        self._upload_part()
+        S3_CLIENT.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+
+    def abort(self) -> None:
+        S3_CLIENT.abort_multipart_upload(
+            Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id
+        )
+
+
+def open_s3_object(bucket_name: str, key: str) -> IO[bytes]:
+    """
+    Opens an S3 object as a stream of bytes, decompressing it on the fly if its key ends in `.gz` or `.zst`.
+    """
+    body = S3_CLIENT.get_object(Bucket=bucket_name, Key=key)["Body"]
+    if key.endswith(".gz"):
+        return gzip.GzipFile(fileobj=body)
+    if key.endswith(".zst"):
+        if zstandard is None:
+            raise ValueError("zstd compressed objects need the zstandard package")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(body))
+    return body
@@ -1,6 +1,5 @@
-from etl.bronze import products
-import awswrangler as wr
-from etl.utils import S3_BUCKET_DATA, S3_BUCKET_BRONZE_PRODUCTS_PATH
+from etl.bronze import write_products
+from etl.utils import BRONZE_BATCH_BYTES, BRONZE_WORKERS
 import os
 import datetime
 
@@ -10,11 +9,8 @@ if __name__ == "__main__":
         if (inputt := os.getenv("day"))
         else datetime.datetime.today()
     )
-    bronze_products_df = products(day)
-    wr.s3.to_parquet(
-        df=bronze_products_df,
-        path=f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_BRONZE_PRODUCTS_PATH}",
-        dataset=True,
-        partition_cols=["date"],
-        mode="overwrite_partitions",
-    )
+    # the memory of the task grows with the batch, not with the products of the day
+    batch_bytes = int(os.getenv("batch_bytes") or BRONZE_BATCH_BYTES)
+    workers = int(os.getenv("workers") or BRONZE_WORKERS)
+    rows = write_products(day, batch_bytes=batch_bytes, workers=workers)
+    print(f"Written {rows} bronze products of {day.date()}")
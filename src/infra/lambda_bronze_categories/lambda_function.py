@@ -1,5 +1,8 @@
+import datetime
+
 import awswrangler as wr
 from etl.bronze import categories
+from etl.planner import plan_category_budgets
 from etl.utils import S3_BUCKET_BRONZE_CATEGORIES_PATH, S3_BUCKET_DATA
 
 
@@ -8,13 +11,20 @@ def lambda_handler(event, context):
     Lambda function handler that executes the ETL process for the bronze categories.
     Args:
         event (dict): The event data passed to the Lambda function.
+            day (str, optional): The day in ISO format the raw products will be downloaded for. Defaults to today.
         context (object): The runtime information of the Lambda function.
     Returns:
         pandas.DataFrame: The resulting DataFrame containing the bronze categories.
     This function retrieves the bronze categories by calling the `bronze_categories` function from the `etl.bronze` module.
     It then saves the DataFrame to a Parquet file in the specified S3 bucket path.
-    The function returns the resulting DataFrame.
+    The function returns the resulting DataFrame, with the `max_products` and `max_concurrency` request budget
+    planned for every category by `etl.planner.plan_category_budgets`.
     """
+    day = (
+        datetime.datetime.fromisoformat(inputt)
+        if (inputt := (event or {}).get("day"))
+        else datetime.datetime.today()
+    )
     bronze_categories_df = categories()
     wr.s3.to_parquet(
         bronze_categories_df,
@@ -25,7 +35,11 @@ def lambda_handler(event, context):
     return {
         "statusCode": 200,
         "headers": {"Content-Type": "application/json"},
-        "body": bronze_categories_df.to_dict(orient="records"),
+        "body": bronze_categories_df.merge(
+            plan_category_budgets(day, bronze_categories_df["category_id"].tolist()),
+            on="category_id",
+            how="left",
+        ).to_dict(orient="records"),
     }
 
 
@@ -1,13 +1,12 @@
 import datetime
 
-import awswrangler as wr
-from etl.gold import gold_location_and_total
-from etl.utils import S3_BUCKET_DATA, S3_BUCKET_GOLD_LOCATIONS_PATH
+from etl.gold import update
+from etl.utils import S3_BUCKET_GOLD_LOCATIONS_PATH
 
 
 def lambda_handler(event, context):
     """
-    This function is the entry point for an AWS Lambda function that retrieves gold locations for a given day and saves them to an S3 bucket.
+    This function is the entry point for an AWS Lambda function that aggregates the gold locations of a given day and publishes their window to an S3 bucket.
 
     Parameters:
         event (dict): The event data passed to the Lambda function. It should contain a "day" key with a string value representing the day in ISO format.
@@ -21,12 +20,7 @@ def lambda_handler(event, context):
         if (inputt := event.get("day"))
         else datetime.datetime.today()
     )
-    gold_locations = gold_location_and_total(day)
-    wr.s3.to_csv(
-        df=gold_locations,
-        path=f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_GOLD_LOCATIONS_PATH}",
-        index=False,
-    )
+    update(day, [S3_BUCKET_GOLD_LOCATIONS_PATH])
     return {
         "statusCode": 200,
         "headers": {"Content-Type": "application/json"},
@@ -1,33 +1,52 @@
-import json
 import datetime
-from etl.raw import download_categories
-from etl.utils import save_json_to_s3, S3_BUCKET_DATA, S3_BUCKET_RAW_CATEGORY_PATH
+from etl.raw import categories_hash, download_categories
+from etl.utils import (
+    load_json_from_s3,
+    save_json_to_s3,
+    S3_BUCKET_DATA,
+    S3_BUCKET_RAW_CATEGORY_PATH,
+    S3_BUCKET_RAW_CATEGORY_STATE_PATH,
+)
 
 
 def lambda_handler(event, context):
     """
     AWS Lambda handler to download categories from the API.
 
+    The category tree rarely changes, so a new day file is only written when its content hash differs from the
+    last written one (or the API answers that it did not change since the last ETag). The hash, ETag and key
+    of the last written file are kept in the S3_BUCKET_RAW_CATEGORY_STATE_PATH state file.
+
     Args:
         event (dict): The event data passed to the Lambda function.
         context (object): The context object passed to the Lambda function.
 
     Returns:
-        dict: A dictionary containing the downloaded categories.
+        dict: A dictionary whose body says whether the categories changed, with their hash and the key of the
+            raw file that holds them.
     """
     day = (
         datetime.datetime.fromisoformat(inputt)
         if (inputt := event.get("day"))
         else datetime.datetime.today()
     )
-    response = download_categories(day)
-    save_json_to_s3(
-        S3_BUCKET_DATA,
-        f"{S3_BUCKET_RAW_CATEGORY_PATH}/{day.date().strftime('%Y-%m-%d')}.json",
-        response,
-    )
+    state = load_json_from_s3(S3_BUCKET_DATA, S3_BUCKET_RAW_CATEGORY_STATE_PATH) or {}
+    response, etag = download_categories(day, etag=state.get("etag"))
+    changed = response is not None and categories_hash(response) != state.get("hash")
+    if changed:
+        state = {
+            "hash": categories_hash(response),
+            "etag": etag,
+            "day": day.date().strftime("%Y-%m-%d"),
+            "key": f"{S3_BUCKET_RAW_CATEGORY_PATH}/{day.date().strftime('%Y-%m-%d')}.json",
+        }
+        save_json_to_s3(S3_BUCKET_DATA, state["key"], response)
+        save_json_to_s3(S3_BUCKET_DATA, S3_BUCKET_RAW_CATEGORY_STATE_PATH, state)
+    elif etag != state.get("etag"):
+        state["etag"] = etag
+        save_json_to_s3(S3_BUCKET_DATA, S3_BUCKET_RAW_CATEGORY_STATE_PATH, state)
     return {
         "statusCode": 200,
         "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(response),
+        "body": {"changed": changed, "hash": state["hash"], "key": state["key"]},
     }
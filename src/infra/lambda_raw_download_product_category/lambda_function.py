@@ -1,61 +1,230 @@
 import datetime
 import asyncio
-from etl.raw import download_products_by_category
+import concurrent.futures
+from typing import Callable, Dict, List, Optional
+from etl.products_index import ProductsIndex
+from etl.raw import download_products_by_categories, download_products_by_category
 from etl.utils import (
+    MAX_CONCURRENT_REQUESTS,
     MAX_PRODUCTS,
+    PAGINATION_WINDOW,
+    RAW_COMPRESSION,
     S3_BUCKET_DATA,
+    S3NDJSONWriter,
+    raw_products_key,
     save_json_to_s3,
-    S3_BUCKET_RAW_PRODUCTS_CATEGORY_PATH,
 )
 import logging
 
 
+def _save_category(
+    day: datetime.datetime,
+    category_id: int,
+    result: Dict,
+    key: str,
+    writer: Optional[S3NDJSONWriter],
+    index: Optional[ProductsIndex],
+) -> Dict:
+    stats = result.pop("stats")
+    logging.info(
+        f"Downloaded {stats['products']} products ({stats['failed_pages']} of {stats['pages']} pages failed, {stats['duplicates']} duplicates) for category {category_id} on {day.date()} and saving to S3 in {key}"
+    )
+    if writer is None:
+        if index is not None:
+            result["search_objects"] = index.slim(result["search_objects"])
+        save_json_to_s3(S3_BUCKET_DATA, key, result)
+    else:
+        writer.close()
+    if index is not None:
+        index.save()
+    return stats
+
+
+def _page_writer(
+    day: datetime.datetime,
+    writers: Dict[int, S3NDJSONWriter],
+    indexes: Dict[int, ProductsIndex],
+    executor: concurrent.futures.Executor,
+    writes: Dict[int, List[concurrent.futures.Future]],
+) -> Callable[[int, List[Dict]], None]:
+    # pages are handed to the writer thread, so serializing, compressing and uploading parts to S3 never blocks
+    # the event loop and the requests in flight of every category
+    date = day.date().strftime("%Y-%m-%d")
+
+    def _write(category_id: int, search_objects: List[Dict]) -> None:
+        if category_id in indexes:
+            search_objects = indexes[category_id].slim(search_objects)
+        writers[category_id].write(
+            {"date": date, "search_objects": search_object}
+            for search_object in search_objects
+        )
+
+    def _write_page(category_id: int, search_objects: List[Dict]) -> None:
+        writes.setdefault(category_id, []).append(
+            executor.submit(_write, category_id, search_objects)
+        )
+
+    return _write_page
+
+
+def _write_error(
+    writes: List[concurrent.futures.Future],
+) -> Optional[BaseException]:
+    # the first error of the finished writes of a category, if any
+    return next((future.exception() for future in writes if future.exception()), None)
+
+
 def lambda_handler(event, context):
     """
-    AWS Lambda handler to download products from a given category.
+    AWS Lambda handler to download products from a given category, or from a batch of categories.
 
     Args:
         event (dict): The event data passed to the Lambda function.
             day (str): The date of the download in ISO format (YYYY-MM-DD).
             category_id (int): The ID of the category to download products from.
-            category_path (str): The path of the category on the Wallapop API.
-            recursion_limit (int, optional): The maximum number of recursive requests to make. Defaults to RECURSION_LIMIT.
+            category_path_root (str): The root path of the category on the Wallapop API.
+            category_search_path (str): The search path of the category on the Wallapop API.
+            max_products (int, optional): The maximum number of products to download. Defaults to MAX_PRODUCTS.
+            max_concurrency (int, optional): The maximum number of requests in flight. Defaults to MAX_CONCURRENT_REQUESTS.
+            window_size (int, optional): The number of pages requested in parallel before checking for the last page. Defaults to PAGINATION_WINDOW.
+            categories (list, optional): A batch of categories, each one with the `category_id`, `category_path_root`,
+                `category_search_path` and optionally `max_products` and `max_concurrency` keys. When given, the
+                single category keys are ignored and `max_concurrency` limits the requests of the whole batch.
+            compression (str, optional): "gzip" or "zstd" to stream the products as compressed NDJSON, one search
+                object per line, through a multipart upload as pages arrive. None to save a single JSON document
+                per category as before. Defaults to RAW_COMPRESSION.
+            incremental (bool, optional): Whether to store the products unchanged since the day before as slim
+                records, using the seen-products index of every category (see `etl.products_index.ProductsIndex`).
+                Defaults to False.
 
     Returns:
-        dict: A dictionary containing the downloaded search objects and the date of the download.
+        dict: A dictionary whose body contains the stats of the download (pages requested, failed pages, products and
+            the duplicates dropped because of the pagination drift). In batch mode the body maps every category ID
+            to its stats, or to an `error` message if the category failed.
 
     Example:
-        >>> lambda_handler({"day": "2022-01-01", "category_id": 123, "category_path": "path/to/category", "recursion_limit": 10000})
-        {'search_objects': [...], 'date': '2022-01-01'}
+        >>> lambda_handler({"day": "2022-01-01", "category_id": 123, "category_path_root": "general", "category_search_path": "category_ids=123", "max_products": 10000})
+        {'statusCode': 200, 'headers': {...}, 'body': {'pages': 10, 'failed_pages': 0, 'products': 378, 'duplicates': 2}}
     """
     day = (
         datetime.datetime.fromisoformat(inputt)
         if (inputt := event.get("day"))
         else datetime.datetime.today()
     )
-    category_id = event["category_id"]
-    category_path_root = event["category_path_root"]
-    category_search_path = event["category_search_path"]
-    max_products = event.get("max_products", MAX_PRODUCTS)
-    logging.info(f"Downloading products for category {category_id} on {day.date()}")
-    result = asyncio.run(
-        download_products_by_category(
-            day,
-            category_id=category_id,
-            category_path_root=category_path_root,
-            category_search_path=category_search_path,
-            max_products=max_products,
+    max_concurrency = event.get("max_concurrency") or MAX_CONCURRENT_REQUESTS
+    window_size = event.get("window_size", PAGINATION_WINDOW)
+    compression = event.get("compression", RAW_COMPRESSION)
+    date = day.date().strftime("%Y-%m-%d")
+    categories = event.get("categories") or [
+        {
+            "category_id": event["category_id"],
+            "category_path_root": event["category_path_root"],
+            "category_search_path": event["category_search_path"],
+            "max_products": event.get("max_products") or MAX_PRODUCTS,
+        }
+    ]
+    keys = {
+        category["category_id"]: raw_products_key(
+            date, category["category_id"], compression
         )
+        for category in categories
+    }
+    writers = (
+        {
+            category_id: S3NDJSONWriter(S3_BUCKET_DATA, key, compression)
+            for category_id, key in keys.items()
+        }
+        if compression
+        else {}
     )
-    logging.info(
-        f"Downloaded {len(result['search_objects'])} products for category {category_id} on {day.date()} and saving to S3 in {S3_BUCKET_RAW_PRODUCTS_CATEGORY_PATH.format(day=day.date().strftime('%Y-%m-%d'))}/{category_id}.json"
+    indexes = (
+        {
+            category["category_id"]: ProductsIndex(category["category_id"], day)
+            for category in categories
+        }
+        if event.get("incremental", False)
+        else {}
     )
-    save_json_to_s3(
-        S3_BUCKET_DATA,
-        f"{S3_BUCKET_RAW_PRODUCTS_CATEGORY_PATH.format(day=day.date().strftime('%Y-%m-%d'))}/{category_id}.json",
+    # a single writer thread keeps the pages of every category in order
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    writes = {}
+    on_page = _page_writer(day, writers, indexes, executor, writes) if writers else None
+    if event.get("categories"):
+        logging.info(
+            f"Downloading products for {len(categories)} categories on {day.date()}"
+        )
+        results = asyncio.run(
+            download_products_by_categories(
+                day,
+                categories=categories,
+                max_concurrency=max_concurrency,
+                window_size=window_size,
+                on_page=on_page,
+            )
+        )
+        executor.shutdown(wait=True)
+        body = {}
+        for category_id, result in results.items():
+            if not isinstance(result, Exception):
+                result = _write_error(writes.get(category_id, [])) or result
+            if isinstance(result, Exception):
+                logging.error(
+                    f"Error downloading products for category {category_id} on {day.date()}: {result}"
+                )
+                if category_id in writers:
+                    writers[category_id].abort()
+                body[category_id] = {"error": str(result)}
+            else:
+                body[category_id] = _save_category(
+                    day,
+                    category_id,
+                    result,
+                    keys[category_id],
+                    writers.get(category_id),
+                    indexes.get(category_id),
+                )
+        return {
+            "statusCode": 200,
+            "headers": {"Content-Type": "application/json"},
+            "body": body,
+        }
+    category = categories[0]
+    category_id = category["category_id"]
+    logging.info(f"Downloading products for category {category_id} on {day.date()}")
+    try:
+        result = asyncio.run(
+            download_products_by_category(
+                day,
+                category_id=category_id,
+                category_path_root=category["category_path_root"],
+                category_search_path=category["category_search_path"],
+                max_products=category["max_products"],
+                max_concurrency=max_concurrency,
+                window_size=window_size,
+                on_page=on_page,
+            )
+        )
+        executor.shutdown(wait=True)
+        if error := _write_error(writes.get(category_id, [])):
+            raise error
+    except Exception:
+        executor.shutdown(wait=True)
+        if category_id in writers:
+            writers[category_id].abort()
+        raise
+    stats = _save_category(
+        day,
+        category_id,
         result,
+        keys[category_id],
+        writers.get(category_id),
+        indexes.get(category_id),
     )
-    return {"statusCode": 200, "headers": {"Content-Type": "application/json"}}
+    return {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": stats,
+    }
 
 
 if __name__ == "__main__":
@@ -1,30 +1,58 @@
 import datetime
 
-import awswrangler as wr
-from etl.silver import products
-from etl.utils import S3_BUCKET_SILVER_PRODUCTS_PATH, S3_BUCKET_DATA
+from etl.silver import backfill_products, write_changed_products, write_products
+from etl.utils import BACKFILL_MAX_DAYS
 
 
 def lambda_handler(event, context):
-    day = (
-        datetime.datetime.fromisoformat(inputt)
-        if (inputt := event.get("day"))
-        else datetime.datetime.today()
-    )
-    silver_products_df = products(day)
-    wr.s3.to_parquet(
-        df=silver_products_df,
-        path=f"s3://{S3_BUCKET_DATA}/{S3_BUCKET_SILVER_PRODUCTS_PATH}",
-        dataset=True,
-        partition_cols=["date"],
-        mode="overwrite_partitions",
-    )
+    """
+    AWS Lambda handler that builds the silver products of a day, of an explicit list of changed days or of a
+    range of days.
+
+    Args:
+        event (dict): The event data passed to the Lambda function.
+            day (str, optional): The day in ISO format. Defaults to today.
+            days (list, optional): Days in ISO format whose bronze partitions changed. When given, only those
+                partitions are built and `day` is ignored.
+            start (str, optional): The first day in ISO format of a range of days to backfill, along with `end`.
+                When given, `day` and `days` are ignored. Ranges longer than BACKFILL_MAX_DAYS days do not fit
+                in the timeout of the Lambda and are rejected, they are split into several invocations.
+            end (str, optional): The last day in ISO format of the range of days to backfill.
+            force (bool, optional): Whether to build even if the inputs did not change since the last build.
+                Defaults to False.
+        context (object): The runtime information of the Lambda function.
+
+    Returns:
+        dict: A dictionary whose body is the manifest of the build (see `etl.silver.write_products`), or the
+            manifests by date when `days` or `start` and `end` are given.
+    """
+    force = event.get("force", False)
+    if event.get("start"):
+        start = datetime.datetime.fromisoformat(event["start"])
+        end = datetime.datetime.fromisoformat(event["end"])
+        if (end.date() - start.date()).days + 1 > BACKFILL_MAX_DAYS:
+            raise ValueError(
+                f"The range {event['start']} to {event['end']} is longer than {BACKFILL_MAX_DAYS} days, split it"
+            )
+        body = backfill_products(start, end, force=force)
+    elif event.get("days"):
+        body = write_changed_products(
+            [datetime.datetime.fromisoformat(day) for day in event["days"]],
+            force=force,
+        )
+    else:
+        day = (
+            datetime.datetime.fromisoformat(inputt)
+            if (inputt := event.get("day"))
+            else datetime.datetime.today()
+        )
+        body = write_products(day, force=force)
     return {
         "statusCode": 200,
         "headers": {"Content-Type": "application/json"},
+        "body": body,
     }
 
 
 if __name__ == "__main__":
-    for day in ["2024-08-08", "2024-08-09", "2024-08-10", "2024-08-11", "2024-08-12"]:
-        lambda_handler({"day": day}, {})
+    lambda_handler({"start": "2024-08-08", "end": "2024-08-12", "force": True}, {})
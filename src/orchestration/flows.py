@@ -10,20 +10,25 @@ from .tasks import (
     gold_categories,
     gold_products,
     raw_categories,
-    raw_product_category,
+    raw_product_categories_batch,
     silver_products,
 )
 
+RAW_BATCH_SIZE = 10
+
 s3_bucket_block = S3Bucket.load("cidaen-tfm-prefect-results")
 
 
 @flow(name="etl-tfm", result_storage=s3_bucket_block)
-def etl(day: Optional[datetime.datetime] = None) -> None:
+def etl(
+    day: Optional[datetime.datetime] = None, batch_size: int = RAW_BATCH_SIZE
+) -> None:
     """
     Executes the Extract, Transform, Load (ETL) process for the Transformation module.
 
     Args:
         day (Optional[datetime.datetime], optional): The date for which the ETL process should run. If not provided, the current date is used. Defaults to None.
+        batch_size (int, optional): The number of categories downloaded by every raw products Lambda invocation. Defaults to RAW_BATCH_SIZE.
 
     Returns:
         None: This function does not return anything.
@@ -31,8 +36,8 @@ def etl(day: Optional[datetime.datetime] = None) -> None:
     Description:
         This function is the main entry point for the ETL process of the Transformation module. It performs the following steps:
         1. Calls the `raw_categories` task to extract raw category data.
-        2. Calls the `bronze_categories` task to retrieve a list of bronze categories.
-        3. Iterates over each bronze category and calls the `raw_product_category` task to extract raw product data for each category.
+        2. Calls the `bronze_categories` task to retrieve a list of bronze categories with their planned request budget.
+        3. Splits the bronze categories in batches of `batch_size` and calls the `raw_product_categories_batch` task to extract raw product data for each batch, every category within its budget.
         4. Calls the `bronze_products` task to extract raw product data.
         5. Calls the `silver_products` task to transform the raw product data.
         6. Submits the `gold_categories` task to load the transformed category data.
@@ -40,7 +45,7 @@ def etl(day: Optional[datetime.datetime] = None) -> None:
         8. Submits the `gold_products` task to load the transformed product data.
 
     Note:
-        - The `raw_categories`, `bronze_categories`, `raw_product_category`, `bronze_products`, `silver_products`, `gold_categories`, `gold_locations`, and `gold_products` tasks are assumed to be defined in the `tasks` module.
+        - The `raw_categories`, `bronze_categories`, `raw_product_categories_batch`, `bronze_products`, `silver_products`, `gold_categories`, `gold_locations`, and `gold_products` tasks are assumed to be defined in the `tasks` module.
         - The `etl` flow is decorated with the `@flow` decorator from the `prefect` library, which indicates that it is a Prefect flow.
 
     Example:
@@ -56,13 +61,20 @@ def etl(day: Optional[datetime.datetime] = None) -> None:
         ```
     """
     raw_categories(day=day)
-    bronze_categories_list = bronze_categories()
-    for category in bronze_categories_list:
-        raw_product_category(
-            day=day,
-            category_id=category["category_id"],
-            category_path_root=category["category_path_root"],
-            category_search_path=category["category_search_path"],
+    bronze_categories_list = bronze_categories(day=day)
+    raw_categories_list = [
+        {
+            "category_id": category["category_id"],
+            "category_path_root": category["category_path_root"],
+            "category_search_path": category["category_search_path"],
+            "max_products": category.get("max_products"),
+            "max_concurrency": category.get("max_concurrency"),
+        }
+        for category in bronze_categories_list
+    ]
+    for start in range(0, len(raw_categories_list), batch_size):
+        raw_product_categories_batch(
+            day=day, categories=raw_categories_list[start : start + batch_size]
         )
 
     bronze_products(day=day)
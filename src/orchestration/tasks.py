@@ -4,13 +4,12 @@ import json
 from prefect import task, get_run_logger
 from prefect.tasks import task_input_hash
 import time
-import random
 import boto3
 from botocore.config import Config
 
 ecs_client = boto3.client("ecs", region_name="eu-west-3")
 lambda_client = boto3.client(
-    "lambda", region_name="eu-west-3", config=Config(read_timeout=600)
+    "lambda", region_name="eu-west-3", config=Config(read_timeout=900)
 )
 
 
@@ -61,7 +60,7 @@ def raw_categories(day: Optional[datetime.datetime] = None) -> Dict:
         day (Optional[datetime.datetime]): The day for which to retrieve the data. If not provided, the current day is used.
 
     Returns:
-        Dict: A dictionary containing the raw category data.
+        Dict: A dictionary saying whether the categories changed, with their content hash and the key of the raw file that holds them.
 
     Raises:
         RuntimeError: If the lambda function "raw_download_categories" fails to execute.
@@ -78,7 +77,7 @@ def raw_categories(day: Optional[datetime.datetime] = None) -> Dict:
         Payload=json.dumps({"day": day.isoformat()}),
     )
     response = _check_lambda_execution_status(result, "raw_download_categories")
-    result = json.loads(response["body"])
+    result = response["body"]
     return result
 
 
@@ -95,6 +94,8 @@ def raw_product_category(
     category_id: int,
     category_path_root: str,
     category_search_path: str,
+    max_products: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
 ) -> None:
     """
     Retrieves raw product category data for a given day and category.
@@ -104,6 +105,8 @@ def raw_product_category(
         category_id (int): The ID of the category.
         category_path_root (str): The root path of the category.
         category_search_path (str): The search path of the category.
+        max_products (Optional[int]): The planned maximum number of products to download. If not provided, the Lambda default is used.
+        max_concurrency (Optional[int]): The planned maximum number of requests in flight. If not provided, the Lambda default is used.
 
     Returns:
         None
@@ -127,17 +130,71 @@ def raw_product_category(
                     "category_id": category_id,
                     "category_path_root": category_path_root,
                     "category_search_path": category_search_path,
+                    "max_products": max_products,
+                    "max_concurrency": max_concurrency,
                 }
             ),
         )
         _check_lambda_execution_status(result, "raw_download_product_category")
-        time.sleep(random.random() * 2)
     except RuntimeError as e:
         get_run_logger().error(
             f"There has been an error downloading category {category_id}: {e}"
         )
 
 
+@task(
+    name="raw_product_categories_batch",
+    cache_key_fn=task_input_hash,
+    cache_expiration=datetime.timedelta(hours=3),
+    retries=1,
+    retry_delay_seconds=10,
+)
+def raw_product_categories_batch(
+    *,
+    day: Optional[datetime.datetime] = None,
+    categories: List[Dict],
+) -> None:
+    """
+    Retrieves raw product category data for a given day and a batch of categories in a single Lambda invocation.
+
+    Args:
+        day (Optional[datetime.datetime]): The day for which to retrieve the data. If not provided, the current day is used.
+        categories (List[Dict]): The categories of the batch, each one with its `category_id`, `category_path_root`,
+            `category_search_path` and planned `max_products` and `max_concurrency`.
+
+    Returns:
+        None
+
+    Raises:
+        RuntimeError: If the lambda function "raw_download_product_category" fails to execute.
+
+    Notes:
+        - The function is decorated with `@task` to indicate that it is a Prefect task.
+        - The task is cached using the `cache_key_fn` and `cache_expiration` parameters.
+        - The task is retried up to one time with a delay of 10 seconds between retries.
+        - The categories that fail inside the Lambda are logged without failing the rest of the batch.
+    """
+    try:
+        day = day or datetime.datetime.now()
+        result = lambda_client.invoke(
+            FunctionName="raw_download_product_category",
+            InvocationType="RequestResponse",
+            Payload=json.dumps({"day": day.isoformat(), "categories": categories}),
+        )
+        response = _check_lambda_execution_status(
+            result, "raw_download_product_category"
+        )
+        for category_id, stats in response["body"].items():
+            if "error" in stats:
+                get_run_logger().error(
+                    f"There has been an error downloading category {category_id}: {stats['error']}"
+                )
+    except RuntimeError as e:
+        get_run_logger().error(
+            f"There has been an error downloading categories {[category['category_id'] for category in categories]}: {e}"
+        )
+
+
 @task(
     name="bronze_categories",
     cache_key_fn=task_input_hash,
@@ -145,20 +202,26 @@ def raw_product_category(
     retries=2,
     retry_delay_seconds=5,
 )
-def bronze_categories() -> List[Dict]:
+def bronze_categories(day: Optional[datetime.datetime] = None) -> List[Dict]:
     """
     Retrieves the bronze categories from the lambda function "bronze_categories".
 
     This function is decorated with `@task` to indicate that it is a Prefect task. The task is cached using the `cache_key_fn` and `cache_expiration` parameters. The task is retried up to two times with a delay of 5 seconds between retries.
 
+    Args:
+        day (Optional[datetime.datetime]): The day the request budget of every category is planned for. If not provided, the current day is used.
+
     Returns:
-        List[Dict]: A list of dictionaries representing the bronze categories.
+        List[Dict]: A list of dictionaries representing the bronze categories, including their `max_products` and `max_concurrency` budget.
 
     Raises:
         RuntimeError: If the lambda function "bronze_categories" fails to execute.
     """
+    day = day or datetime.datetime.now()
     result = lambda_client.invoke(
-        FunctionName="bronze_categories", InvocationType="RequestResponse"
+        FunctionName="bronze_categories",
+        InvocationType="RequestResponse",
+        Payload=json.dumps({"day": day.isoformat()}),
     )
     response = _check_lambda_execution_status(result, "bronze_categories")
     categories = response["body"]
@@ -224,7 +287,9 @@ def bronze_products(day: Optional[datetime.datetime] = None) -> None:
     retries=2,
     retry_delay_seconds=5,
 )
-def silver_products(day: Optional[datetime.datetime] = None) -> None:
+def silver_products(
+    day: Optional[datetime.datetime] = None, force: bool = False
+) -> None:
     """
     Runs the "silver_products" task using AWS Lambda.
 
@@ -236,12 +301,14 @@ def silver_products(day: Optional[datetime.datetime] = None) -> None:
 
     Parameters:
         day (Optional[datetime.datetime]): The day for which to retrieve the silver products. If not provided, the current day is used.
+        force (bool): Whether to rebuild the day even if its bronze inputs did not change since the last build.
 
     Returns:
         None
 
     Retries:
-        - The task is retried up to two times with a delay of 5 seconds between retries.
+        - The task is retried up to two times with a delay of 5 seconds between retries. Retries after a build
+          that succeeded are skipped by the Lambda, as the inputs did not change.
 
     Caching:
         - The task is cached using the `cache_key_fn` and `cache_expiration` parameters.
@@ -251,7 +318,7 @@ def silver_products(day: Optional[datetime.datetime] = None) -> None:
     result = lambda_client.invoke(
         FunctionName="silver_products",
         InvocationType="RequestResponse",
-        Payload=json.dumps({"day": day.isoformat()}),
+        Payload=json.dumps({"day": day.isoformat(), "force": force}),
     )
     _check_lambda_execution_status(result, "silver_products")
 
@@ -0,0 +1,63 @@
+import datetime
+
+import pyarrow as pa
+from etl.bronze import _parse_created_at
+
+UTC = datetime.timezone.utc
+
+
+def test_parse_created_at_parses_each_value_on_its_own():
+    created_at = _parse_created_at(
+        pa.chunked_array(
+            [
+                [
+                    "2024-08-01T23:30:00+02:00",
+                    "2024-08-01T10:00:00Z",
+                    "2024-08-01T10:00:00.123456Z",
+                    "2024-08-01T10:00:00.5+0100",
+                    "2024-08-01T10:00:00",
+                    "2024-08-01",
+                    "garbage",
+                    None,
+                ]
+            ],
+            pa.string(),
+        )
+    )
+    assert created_at.type == pa.timestamp("ms", tz="UTC")
+    assert created_at.to_pylist() == [
+        datetime.datetime(2024, 8, 1, 21, 30, tzinfo=UTC),
+        datetime.datetime(2024, 8, 1, 10, 0, tzinfo=UTC),
+        datetime.datetime(2024, 8, 1, 10, 0, 0, 123000, tzinfo=UTC),
+        datetime.datetime(2024, 8, 1, 9, 0, 0, 500000, tzinfo=UTC),
+        datetime.datetime(2024, 8, 1, 10, 0, tzinfo=UTC),
+        datetime.datetime(2024, 8, 1, tzinfo=UTC),
+        None,
+        None,
+    ]
+
+
+def test_parse_created_at_edge_cases():
+    created_at = _parse_created_at(
+        pa.chunked_array(
+            [
+                ["2024-12-31T23:59:59.999-01:00", "2024-02-29T12:00:00.1+00:00"],
+                ["", "2024-13-01T00:00:00Z", "2024-08-01T10:00:00.123Z"],
+            ],
+            pa.string(),
+        )
+    )
+    assert created_at.to_pylist() == [
+        datetime.datetime(2025, 1, 1, 0, 59, 59, 999000, tzinfo=UTC),
+        datetime.datetime(2024, 2, 29, 12, 0, 0, 100000, tzinfo=UTC),
+        None,
+        None,
+        datetime.datetime(2024, 8, 1, 10, 0, 0, 123000, tzinfo=UTC),
+    ]
+
+
+def test_parse_created_at_empty_and_null_batches():
+    assert _parse_created_at(pa.chunked_array([], pa.string())).to_pylist() == []
+    assert _parse_created_at(
+        pa.chunked_array([[None, None]], pa.string())
+    ).to_pylist() == [None, None]
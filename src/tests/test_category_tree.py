@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from etl.category_tree import CategoryTree
+
+
+def test_empty_tree_lookups_are_unknown():
+    tree = CategoryTree.from_categories([])
+    assert tree.name_of([1, 2]).tolist() == [None, None]
+    assert tree.hierarchy_of([1]).tolist() == [None]
+    assert tree.root_of([1]).tolist() == [-1]
+    assert tree.depth_of([1]).tolist() == [-1]
+    assert tree.ancestors_of([1]).tolist() == [[-1]]
+    assert tree.descendants_of(1).tolist() == []
+    assert not tree.is_descendant_of(np.array([1]), 1).any()
+
+
+@pytest.fixture
+def tree() -> CategoryTree:
+    return CategoryTree.from_categories(
+        [
+            {
+                "id": 100,
+                "name": "Motor",
+                "subcategories": [
+                    {
+                        "id": 110,
+                        "name": "Cars",
+                        "subcategories": [{"id": 111, "name": "Parts"}],
+                    },
+                    {"id": 120, "name": "Bikes"},
+                ],
+            },
+            {"id": 200, "name": "Home"},
+        ]
+    )
+
+
+def test_name_and_hierarchy_lookups(tree):
+    category_ids = [111, 200, 100, 999]
+    assert tree.name_of(category_ids).tolist() == ["Parts", "Home", "Motor", None]
+    assert tree.hierarchy_of(category_ids).tolist() == [
+        "Motor > Cars > Parts",
+        "Home",
+        "Motor",
+        None,
+    ]
+    assert tree.root_of(category_ids).tolist() == [100, 200, 100, -1]
+    assert tree.depth_of(category_ids).tolist() == [2, 0, 0, -1]
+
+
+def test_ancestors_and_descendants(tree):
+    assert tree.ancestors_of([111, 120, 999]).tolist() == [
+        [100, 110, 111],
+        [100, 120, -1],
+        [-1, -1, -1],
+    ]
+    assert sorted(tree.descendants_of(110).tolist()) == [110, 111]
+    assert tree.descendants_of(999).tolist() == []
+    assert tree.is_descendant_of([111, 120, 200, 999], 110).tolist() == [
+        True,
+        False,
+        False,
+        False,
+    ]
+
+
+def test_merge_keeps_the_last_version(tree):
+    renamed = CategoryTree.from_categories([{"id": 200, "name": "House"}])
+    merged = CategoryTree.merge([tree, renamed])
+    assert len(merged) == len(tree)
+    assert merged.name_of([200, 111]).tolist() == ["House", "Parts"]
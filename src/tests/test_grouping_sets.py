@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from etl.grouping_sets import aggregate_grouping_sets
+
+AGGREGATIONS = {
+    "price_mean": ("price", "mean"),
+    "price_max": ("price", "max"),
+    "price_min": ("price", "min"),
+    "product_id": ("product_id", "count"),
+}
+
+
+@pytest.fixture
+def products() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    n = 1000
+    cities = pd.Series(rng.choice(["A", "B", "C"], n)).where(rng.random(n) > 0.1)
+    return pd.DataFrame(
+        {
+            "date": rng.choice(["2024-08-01", "2024-08-02"], n),
+            "city": cities,
+            "category": rng.choice(["x", "y"], n),
+            "product_id": [f"p{i}" for i in range(n)],
+            "price": rng.integers(1, 1000, n) / 10,
+        }
+    )
+
+
+def _groupby(products: pd.DataFrame, keys) -> pd.DataFrame:
+    return (
+        products.groupby(keys)
+        .agg(**AGGREGATIONS)
+        .reset_index()
+        .loc[:, keys + list(AGGREGATIONS)]
+    )
+
+
+def test_grouping_sets_match_a_groupby_per_set(products):
+    returned = aggregate_grouping_sets(
+        products,
+        [["date", "city", "category"], ["date", "city"], ["date"]],
+        AGGREGATIONS,
+    )
+    expected = pd.concat(
+        [
+            _groupby(products, ["date", "city", "category"]),
+            _groupby(products, ["date", "city"]).assign(category="--"),
+            _groupby(products, ["date"]).assign(city="--", category="--"),
+        ],
+        ignore_index=True,
+    )
+    pd.testing.assert_frame_equal(
+        returned, expected[returned.columns.tolist()], check_dtype=False
+    )
+
+
+def test_grouping_sets_totals_count_rows_with_null_keys(products):
+    returned = aggregate_grouping_sets(products, [["date", "city"], []], AGGREGATIONS)
+    total = returned[returned["date"] == "--"]
+    assert total["product_id"].tolist() == [len(products)]
+    assert total["price_max"].tolist() == [products["price"].max()]
+    assert total["price_mean"].iloc[0] == pytest.approx(products["price"].mean())
+    assert returned.loc[returned["date"] != "--", "product_id"].sum() == (
+        products["city"].notna().sum()
+    )
+
+
+def test_grouping_sets_reject_unsupported_aggregations(products):
+    with pytest.raises(ValueError):
+        aggregate_grouping_sets(products, [["date"]], {"p": ("price", "median")})
@@ -0,0 +1,64 @@
+import asyncio
+import types
+
+import pytest
+from etl import raw
+from etl.raw import TokenBucket
+
+
+class _Clock:
+    # a monotonic clock that only moves when the token bucket sleeps. The tests use rates whose waits are
+    # exact binary fractions, so it adds up exactly
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(raw, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(
+        raw, "asyncio", types.SimpleNamespace(Lock=asyncio.Lock, sleep=clock.sleep)
+    )
+    return clock
+
+
+def _acquire(bucket: TokenBucket, n: int) -> None:
+    async def _run():
+        for _ in range(n):
+            await bucket.acquire()
+
+    asyncio.run(_run())
+
+
+def test_token_bucket_allows_a_burst_of_its_capacity(clock):
+    bucket = TokenBucket(rate=4, capacity=8)
+    _acquire(bucket, 8)
+    assert clock.sleeps == []
+    _acquire(bucket, 1)
+    assert clock.now == 0.25
+
+
+def test_token_bucket_refills_at_its_rate_up_to_its_capacity(clock):
+    bucket = TokenBucket(rate=4, capacity=8)
+    _acquire(bucket, 8)
+    clock.now += 64
+    _acquire(bucket, 8)
+    assert clock.sleeps == []
+    _acquire(bucket, 4)
+    assert clock.now == 65
+
+
+def test_token_bucket_pause_delays_the_next_request(clock):
+    bucket = TokenBucket(rate=4)
+    bucket.pause(2)
+    _acquire(bucket, 1)
+    assert clock.now == 2.25
@@ -0,0 +1,66 @@
+import datetime
+
+import pandas as pd
+from etl.category_tree import CategoryTree
+from etl.silver import build_products
+
+DAY = datetime.datetime(2024, 8, 2)
+TREE = CategoryTree.from_categories(
+    [{"id": 1, "name": "Root", "subcategories": [{"id": 2, "name": "Leaf"}]}]
+)
+
+
+def _products_bronze(created_at) -> pd.DataFrame:
+    n = len(created_at)
+    return pd.DataFrame(
+        {
+            "product_id": [f"p{i}" for i in range(n)],
+            "user_id": "u",
+            "category_id": [2] * n,
+            "created_at": created_at,
+            "title": "t",
+            "web_slug": "s",
+            "price": 1.0,
+            "currency": "EUR",
+            "country_code": "ES",
+            "city": "Madrid",
+            "postal_code": "28001",
+            "date": DAY.strftime("%Y-%m-%d"),
+        }
+    )
+
+
+def test_build_products_counts_legacy_strings_from_their_local_date():
+    products_silver = build_products(
+        _products_bronze(
+            [
+                "2024-08-01T00:30:00+02:00",
+                "2024-08-01T10:00:00.000Z",
+                "2024-08-01T10:00:00Z",
+            ]
+        ),
+        TREE,
+        DAY,
+    )
+    assert products_silver["days_since_creation"].tolist() == [1, 1, 1]
+    assert products_silver["created_at"].tolist() == [
+        pd.Timestamp("2024-07-31T22:30:00Z"),
+        pd.Timestamp("2024-08-01T10:00:00Z"),
+        pd.Timestamp("2024-08-01T10:00:00Z"),
+    ]
+    assert products_silver["category_hierarchy"].tolist() == ["Root > Leaf"] * 3
+
+
+def test_build_products_counts_timestamps_from_their_utc_date():
+    products_silver = build_products(
+        _products_bronze(
+            pd.to_datetime(
+                ["2024-07-31T22:30:00Z", "2024-08-01T10:00:00.123Z", None],
+                utc=True,
+                format="ISO8601",
+            )
+        ),
+        TREE,
+        DAY,
+    )
+    assert products_silver["days_since_creation"].tolist() == [2, 1, pd.NA]